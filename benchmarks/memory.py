@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+"""
+Memory benchmark of the per-session authentication state of CognitoOAuth.
+
+Fills the bearer token and background job owner caches of a CognitoOAuth
+instance the way it's done while serving requests, one entry of each per
+simulated session, and reports the memory used per session as measured by
+tracemalloc and as accounted by the caches. Users are stored as tuples of their
+attribute values, --dict-users stores the mapped attribute dicts instead for
+comparison. The caches keep their configured bounds, so without
+--cache-max-bytes only the last 1024 sessions are retained, as in a deployment.
+
+Example:
+
+    python benchmarks/memory.py --sessions 100000 --cache-max-bytes 50000000
+"""
+
+import argparse
+import gc
+import hashlib
+import time
+import tracemalloc
+
+from dash import Dash, html
+from flask import Flask
+
+from dash_cognito_auth import CognitoOAuth
+
+
+def make_auth(args) -> CognitoOAuth:
+    app = Dash(__name__, server=Flask(__name__), url_base_pathname="/")
+    app.layout = html.Div()
+    app.server.secret_key = "benchmark"
+    return CognitoOAuth(
+        app,
+        domain="benchmark",
+        region="eu-central-1",
+        user_info_to_session_attr_mapping={
+            "sub": "user_id",
+            "email": "email",
+            "username": "username",
+        },
+        bearer_token_cache_ttl=3600,
+        background_job_ttl=3600,
+        cache_max_bytes=args.cache_max_bytes,
+    )
+
+
+def fill(auth: CognitoOAuth, sessions: int, dict_users: bool):
+    for number in range(sessions):
+        user_info = {
+            "sub": f"{number:08d}-4b1c-9f7e-2d3a-6e5f4c3b2a10",
+            "email": f"user{number}@example.com",
+            "username": f"user{number}",
+        }
+        user = auth.map_user_info(user_info)
+        cached_user = user if dict_users else auth.pack_user(user)
+        access_token = f"access-token-{number}".encode()
+
+        auth.bearer_token_cache.set(hashlib.sha256(access_token).digest(), cached_user)
+        auth.job_owners.set(
+            f"{number}~{hashlib.sha256(access_token).hexdigest()}",
+            (hashlib.sha256(access_token).digest(), cached_user),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--cache-max-bytes", type=int, default=None)
+    parser.add_argument("--dict-users", action="store_true")
+    args = parser.parse_args()
+
+    auth = make_auth(args)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fill(auth, args.sessions, args.dict_users)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    measured, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    caches = {"bearer_tokens": auth.bearer_token_cache, "job_owners": auth.job_owners}
+    accounted = sum(cache.bytes for cache in caches.values())
+
+    print(f"sessions:            {args.sessions}")
+    print(f"users stored as:     {'dicts' if args.dict_users else 'tuples'}")
+    print(f"fill time:           {elapsed:.2f} s")
+    for name, cache in caches.items():
+        print(f"{name + ':':<20} {len(cache)} entries, {cache.bytes} bytes accounted")
+    print(f"measured:            {measured / 2**20:.1f} MiB")
+    print(f"accounted:           {accounted / 2**20:.1f} MiB")
+    # Only the most recent sessions are retained, up to cache_max_bytes or, if it
+    # isn't set, the default number of entries of the caches
+    retained = min(len(cache) for cache in caches.values())
+    print(f"retained sessions:   {retained}")
+    print(f"bytes per session:   {measured / retained:.0f} measured")
+    print(f"                     {accounted / retained:.0f} accounted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+#! /usr/bin/env python
+"""
+Soak / load test harness for CognitoOAuth.
+
+Starts a stub Cognito, a pre-forked multi-worker server hosting a small Dash app
+wrapped with CognitoOAuth and a population of simulated users. Every user logs
+in through the stub's authorization flow, loads the page, fires bursts of
+callbacks, polls like a dcc.Interval, logs in again once the token expired and
+finally logs out, over and over until the test ends.
+
+Every report interval the harness prints throughput, latency percentiles per
+request type, status codes, the calls that reached the stub Cognito and the
+memory (RSS) of every worker, so leaks and stampedes become visible over time.
+
+Example:
+
+    python benchmarks/soak.py --workers 4 --users 50 --duration 3600
+
+Memory figures are read from /proc and only available on Linux.
+"""
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import requests
+
+# The stub Cognito speaks plain HTTP
+os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+
+# --- Stub Cognito ---------------------------------------------------------------
+
+
+def make_token(username: str, lifetime: int) -> dict:
+    expires_at = int(time.time()) + lifetime
+    claims = {"sub": username, "email": f"{username}@example.com"}
+    id_token = ".".join(
+        [
+            "e30",
+            base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("="),
+            "signature",
+        ]
+    )
+    return {
+        "access_token": f"{username}.{expires_at}.{uuid.uuid4().hex}",
+        "id_token": id_token,
+        "refresh_token": uuid.uuid4().hex,
+        "expires_in": lifetime,
+        "token_type": "Bearer",
+    }
+
+
+class StubCognitoHandler(BaseHTTPRequestHandler):
+    """
+    Implements the parts of the Cognito hosted UI and OAuth endpoints used by
+    CognitoOAuth. The "login form" is skipped, the authorize endpoint expects
+    the simulated user's name in the username query parameter.
+    """
+
+    protocol_version = "HTTP/1.1"
+    token_lifetime = 300
+    calls = Counter()
+    calls_lock = threading.Lock()
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def count(self, endpoint: str):
+        with self.calls_lock:
+            self.calls[endpoint] += 1
+
+    def reply(self, status: int, body: dict = None, headers: dict = None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_HEAD(self):  # pylint: disable=C0103
+        self.count("head")
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):  # pylint: disable=C0103
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/oauth2/authorize":
+            self.count("authorize")
+            code = f"{query['username']}.{uuid.uuid4().hex}"
+            target = f"{query['redirect_uri']}?" + urlencode(
+                {"code": code, "state": query["state"]}
+            )
+            self.reply(302, headers={"Location": target})
+        elif url.path == "/oauth2/userInfo":
+            self.count("userInfo")
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            username, expires_at, _ = (token.split(".") + ["", "", ""])[:3]
+            if not expires_at.isdigit() or int(expires_at) < time.time():
+                self.reply(401, {"error": "invalid_token"})
+            else:
+                self.reply(200, {"sub": username, "email": f"{username}@example.com"})
+        elif url.path == "/logout":
+            self.count("logout")
+            self.reply(302, headers={"Location": query["logout_uri"]})
+        elif url.path == "/_stats":
+            with self.calls_lock:
+                self.reply(200, dict(self.calls))
+        else:
+            self.reply(404)
+
+    def do_POST(self):  # pylint: disable=C0103
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        form = {key: values[0] for key, values in parse_qs(body).items()}
+
+        if urlparse(self.path).path == "/oauth2/token":
+            self.count("token")
+            username = form.get("code", "").split(".")[0]
+            self.reply(200, make_token(username, self.token_lifetime))
+        else:
+            self.reply(404)
+
+
+def run_stub_cognito(sock: socket.socket, token_lifetime: int):
+    StubCognitoHandler.token_lifetime = token_lifetime
+    server = ThreadingHTTPServer(sock.getsockname(), StubCognitoHandler, False)
+    server.socket = sock
+    server.serve_forever()
+
+
+# --- App workers ----------------------------------------------------------------
+
+
+def make_app(cognito_address: str, options: dict):
+    # pylint: disable=import-outside-toplevel
+    from dash import Dash, Input, Output, dcc, html
+    from flask import Flask
+
+    from dash_cognito_auth import CognitoOAuth
+
+    dash_app = Dash("soak", server=Flask("soak"), url_base_pathname="/")
+    dash_app.layout = html.Div(
+        [
+            dcc.Input(id="in", value="hello"),
+            html.Div(id="out"),
+            dcc.Interval(id="interval"),
+        ]
+    )
+
+    @dash_app.callback(Output("out", "children"), Input("in", "value"))
+    def echo(value):
+        return value
+
+    dash_app.server.secret_key = "soak-test"
+    dash_app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "soak-client"
+    dash_app.server.config["COGNITO_OAUTH_CLIENT_SECRET"] = "soak-secret"
+
+    # A domain containing a "." is treated as custom domain
+    auth = CognitoOAuth(
+        dash_app, domain=cognito_address, logout_url="logout", **options
+    )
+
+    # Point everything to the plain HTTP stub
+    base_url = f"http://{cognito_address}"
+    blueprint = dash_app.server.blueprints["cognito"]
+    blueprint.base_url = base_url
+    blueprint.authorization_url = f"{base_url}/oauth2/authorize"
+    blueprint.token_url = f"{base_url}/oauth2/token"
+    auth.cognito_base_url = base_url
+    auth.user_info_url = f"{base_url}/oauth2/userInfo"
+    auth.http_session.mount("http://", auth.http_session.get_adapter("https://"))
+
+    return dash_app
+
+
+def run_worker(sock: socket.socket, cognito_address: str, options: dict):
+    # pylint: disable=import-outside-toplevel
+    import logging
+
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    dash_app = make_app(cognito_address, options)
+    host, port = sock.getsockname()
+    server = make_server(host, port, dash_app.server, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def rss_kib(pid: int):
+    try:
+        with open(f"/proc/{pid}/status", "rt", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# --- Simulated users ------------------------------------------------------------
+
+
+CALLBACK_PAYLOAD = {
+    "output": "out.children",
+    "outputs": {"id": "out", "property": "children"},
+    "inputs": [{"id": "in", "property": "value", "value": "hello"}],
+    "changedPropIds": ["in.value"],
+    "state": [],
+}
+
+
+class Recorder:
+    """
+    Collects latencies and status codes of the simulated users.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = Counter()
+        self.events = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, latency: float, status: int):
+        with self._lock:
+            self.latencies[kind].append(latency)
+            self.statuses[status] += 1
+
+    def event(self, name: str):
+        with self._lock:
+            self.events[name] += 1
+
+    def drain(self):
+        with self._lock:
+            latencies, self.latencies = self.latencies, defaultdict(list)
+            statuses, self.statuses = self.statuses, Counter()
+            events, self.events = self.events, Counter()
+        return latencies, statuses, events
+
+
+class SimulatedUser(threading.Thread):
+    """
+    A browser tab that logs in, loads the page, fires callbacks and polls.
+    """
+
+    def __init__(self, name, base_url, recorder, stop, args):
+        super().__init__(name=name, daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop = stop
+        self.args = args
+        self.http = requests.Session()
+
+    def call(self, kind: str, method: str, path: str, **kwargs):
+        url = path if path.startswith("http") else self.base_url + path
+        start = time.perf_counter()
+        response = self.http.request(
+            method, url, allow_redirects=False, timeout=30, **kwargs
+        )
+        self.recorder.record(kind, time.perf_counter() - start, response.status_code)
+        return response
+
+    def login(self) -> bool:
+        response = self.call("index", "GET", "/")
+        if response.status_code == 200:
+            return True
+
+        login = self.call("login", "GET", response.headers["Location"])
+        authorize = self.call(
+            "authorize",
+            "GET",
+            login.headers["Location"] + "&" + urlencode({"username": self.name}),
+        )
+        authorized = self.call("authorized", "GET", authorize.headers["Location"])
+        if authorized.status_code != 302:
+            return False
+
+        self.recorder.event("logins")
+        return self.call("index", "GET", "/").status_code == 200
+
+    def load_page(self):
+        self.call("layout", "GET", "/_dash-layout")
+        self.call("dependencies", "GET", "/_dash-dependencies")
+
+    def callback(self) -> bool:
+        response = self.call(
+            "callback", "POST", "/_dash-update-component", json=CALLBACK_PAYLOAD
+        )
+        return response.status_code == 200
+
+    def session_round(self):
+        if not self.login():
+            self.recorder.event("failed_logins")
+            return
+
+        self.load_page()
+        session_end = time.monotonic() + random.uniform(0.5, 1.5) * self.args.session
+        while time.monotonic() < session_end and not self.stop.is_set():
+            for _ in range(random.randint(1, self.args.burst)):
+                if not self.callback():
+                    # Token expired, the page reloads and sends us to the login
+                    self.recorder.event("expired")
+                    if not self.login():
+                        return
+                    self.load_page()
+            self.stop.wait(self.args.poll_interval)
+
+        self.call("logout", "GET", "/logout")
+        self.recorder.event("logouts")
+        self.http.cookies.clear()
+
+    def run(self):
+        # Spread the logins of the population over the first seconds
+        self.stop.wait(random.uniform(0, self.args.ramp_up))
+        while not self.stop.is_set():
+            try:
+                self.session_round()
+            except (requests.RequestException, KeyError) as error:
+                self.recorder.event(f"error:{type(error).__name__}")
+                self.stop.wait(1)
+
+
+# --- Reporting ------------------------------------------------------------------
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(elapsed, interval, recorder, cognito_url, workers, baseline_rss):
+    latencies, statuses, events = recorder.drain()
+    total = sum(len(values) for values in latencies.values())
+
+    print(f"\n=== t={elapsed:7.0f}s  {total / interval:8.1f} req/s")
+    print(f"{'request':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, values in sorted(latencies.items()):
+        print(
+            f"{kind:<14}{len(values):>8}"
+            f"{percentile(values, 0.5) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}"
+            f"{percentile(values, 0.99) * 1000:>10.1f}"
+        )
+    print("status codes: ", dict(sorted(statuses.items())))
+    print("user events:  ", dict(sorted(events.items())))
+
+    try:
+        upstream = requests.get(f"{cognito_url}/_stats", timeout=5).json()
+    except requests.RequestException:
+        upstream = "unavailable"
+    print("cognito calls (total):", upstream)
+
+    rss = {worker.pid: rss_kib(worker.pid) for worker in workers}
+    growth = {
+        pid: (value - baseline_rss[pid]) // 1024
+        for pid, value in rss.items()
+        if value is not None and baseline_rss.get(pid) is not None
+    }
+    print(
+        "worker RSS MiB:",
+        {pid: value // 1024 for pid, value in rss.items() if value is not None},
+        " growth MiB:",
+        growth,
+    )
+
+
+def listening_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=300, help="seconds")
+    parser.add_argument("--report-interval", type=float, default=30)
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds")
+    parser.add_argument(
+        "--session", type=float, default=60, help="average session length"
+    )
+    parser.add_argument("--burst", type=int, default=5, help="max callbacks at once")
+    parser.add_argument("--poll-interval", type=float, default=1)
+    parser.add_argument("--token-lifetime", type=int, default=45)
+    parser.add_argument("--ticket-ttl", type=int, default=None)
+    parser.add_argument("--max-upstream-calls", type=int, default=None)
+    parser.add_argument("--compact-session", action="store_true")
+    parser.add_argument("--cache-index", action="store_true")
+    parser.add_argument("--cache-dash-metadata", action="store_true")
+    args = parser.parse_args()
+
+    options = {
+        "ticket_ttl": args.ticket_ttl,
+        "max_upstream_calls": args.max_upstream_calls,
+        "compact_session": args.compact_session,
+        "cache_index": args.cache_index,
+        "cache_dash_metadata": args.cache_dash_metadata,
+    }
+
+    context = multiprocessing.get_context("fork")
+
+    cognito_sock = listening_socket()
+    cognito_address = "%s:%d" % cognito_sock.getsockname()
+    cognito = context.Process(
+        target=run_stub_cognito,
+        args=(cognito_sock, args.token_lifetime),
+        daemon=True,
+    )
+    cognito.start()
+
+    app_sock = listening_socket()
+    base_url = "http://%s:%d" % app_sock.getsockname()
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(app_sock, cognito_address, options),
+            daemon=True,
+        )
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # Wait for the workers to serve requests before measuring
+    for _ in range(100):
+        try:
+            requests.get(base_url + "/", allow_redirects=False, timeout=1)
+            break
+        except requests.RequestException:
+            time.sleep(0.1)
+    baseline_rss = {worker.pid: rss_kib(worker.pid) for worker in workers}
+
+    print(
+        f"app {base_url} ({args.workers} workers), stub Cognito {cognito_address}, "
+        f"{args.users} users for {args.duration:.0f}s"
+    )
+
+    recorder = Recorder()
+    stop = threading.Event()
+    users = [
+        SimulatedUser(f"user-{number}", base_url, recorder, stop, args)
+        for number in range(args.users)
+    ]
+    for user in users:
+        user.start()
+
+    start = last_report = time.monotonic()
+    try:
+        while (elapsed := time.monotonic() - start) < args.duration:
+            stop.wait(min(args.report_interval, args.duration - elapsed))
+            now = time.monotonic()
+            report(
+                now - start,
+                now - last_report,
+                recorder,
+                f"http://{cognito_address}",
+                workers,
+                baseline_rss,
+            )
+            last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for process in workers + [cognito]:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Asynchronous audit log of authentication events.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class AuditLog:
+    """
+    Collects authentication events in a bounded in-memory queue and hands them
+    in batches to a sink on a background thread.
+
+    The sink is a callable that receives a list of events, each event is a dict
+    with at least the keys "event" and "time". Recording an event never blocks,
+    if the queue is full the event is dropped and counted instead.
+    """
+
+    def __init__(
+        self,
+        sink,
+        max_queue_size: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        """
+        Record an event without waiting for it to be written.
+        """
+        if self._thread is None:
+            self._start()
+
+        try:
+            self._queue.put_nowait({"event": event, "time": time.time(), **fields})
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="cognito-audit-log", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self.sink(batch)
+                self.written += len(batch)
+            except Exception:  # pylint: disable=broad-except
+                self.failed += len(batch)
+                log.exception("Could not write %d audit log events", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """
+        Block until all recorded events have been handed to the sink.
+        """
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class JsonlFileSink:
+    """
+    Appends events to a file, one JSON document per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __call__(self, events: list[dict]):
+        lines = "".join(json.dumps(event) + "\n" for event in events)
+        with open(self.path, "at", encoding="utf-8") as log_file:
+            log_file.write(lines)
+
+
+class LoggerSink:
+    """
+    Writes events as JSON to a logger, e.g. one with a
+    :class:`logging.handlers.SysLogHandler` to send them to syslog.
+    """
+
+    def __init__(self, logger: logging.Logger, level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def __call__(self, events: list[dict]):
+        for event in events:
+            self.logger.log(self.level, json.dumps(event))
@@ -0,0 +1,164 @@
+"""
+Small in-process caches used by the Cognito authentication.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def size_of(value) -> int:
+    """
+    Approximate number of bytes used by a value, including the items of tuples,
+    lists and dicts.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(size_of(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(size_of(key) + size_of(item) for key, item in value.items())
+    return size
+
+
+class CacheEntry:
+    __slots__ = ("expires_at", "value", "size")
+
+    def __init__(self, expires_at: float, value, size: int):
+        self.expires_at = expires_at
+        self.value = value
+        self.size = size
+
+
+# Memory used by an entry besides its key and value: the CacheEntry itself and
+# its slot in the OrderedDict (hash table entry and linked list node)
+ENTRY_OVERHEAD = sys.getsizeof(CacheEntry(0.0, None, 0)) + 100
+
+# Number of entries a cache keeps if it's bounded neither by maxsize nor maxbytes
+DEFAULT_MAXSIZE = 1024
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    The cache is bounded by the number of entries (maxsize) and, if maxbytes is
+    set, by the approximate memory its keys and values use. If only maxbytes is
+    set, the number of entries isn't bounded, without either the cache keeps
+    DEFAULT_MAXSIZE entries. Besides the values it keeps hit and miss counters so
+    the effectiveness of the cache can be monitored.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = 300, maxbytes: int = None):
+        if maxsize is None and maxbytes is None:
+            maxsize = DEFAULT_MAXSIZE
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value for key if it's cached and not expired, else default.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            if entry.expires_at <= time.monotonic():
+                del self._data[key]
+                self.bytes -= entry.size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Cache value under key for ttl seconds (the cache default if omitted).
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        entry = CacheEntry(
+            expires_at, value, ENTRY_OVERHEAD + size_of(key) + size_of(value)
+        )
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.size
+            self._data[key] = entry
+            self.bytes += entry.size
+
+            while (self.maxsize is not None and len(self._data) > self.maxsize) or (
+                self.maxbytes is not None and self.bytes > self.maxbytes
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def pop(self, key, default=None):
+        """
+        Remove key from the cache and return its value.
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self.bytes -= entry.size
+        return entry.value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def snapshot(self) -> list:
+        """
+        Return the unexpired entries as (key, expiry as a Unix timestamp, value).
+        """
+        now, wall_now = time.monotonic(), time.time()
+        with self._lock:
+            return [
+                (key, wall_now + entry.expires_at - now, entry.value)
+                for key, entry in self._data.items()
+                if entry.expires_at > now
+            ]
+
+    def restore(self, entries: list) -> int:
+        """
+        Add the entries of a snapshot that haven't expired in the meantime.
+
+        Returns the number of restored entries.
+        """
+        wall_now = time.time()
+        restored = 0
+        for key, expires_at, value in entries:
+            if expires_at > wall_now:
+                self.set(key, value, ttl=min(expires_at - wall_now, self.ttl))
+                restored += 1
+        return restored
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "maxbytes": self.maxbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 4),
+        }
@@ -1,11 +1,91 @@
+import base64
+import binascii
+import json
+
 from flask_dance.consumer import OAuth2ConsumerBlueprint
 from flask.globals import LocalProxy
-from flask import g
+from flask import current_app, g, has_app_context, has_request_context
 
 
 __maintainer__ = "Frank Spijkerman <frank@jeito.nl>"
 
 
+class TenantAttribute:
+    """
+    Blueprint attribute that is taken from the tenant of the request, if the
+    blueprint is in multi-tenant mode, or else from the app config option
+    config_key, if it's set.
+
+    Unlike the from_config mechanism of Flask-Dance, which assigns the options
+    before every request and thereby creates the OAuth session, the config is
+    only read when the attribute is used.
+    """
+
+    def __init__(self, tenant_attr: str, config_key: str = None):
+        self.tenant_attr = tenant_attr
+        self.config_key = config_key
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, blueprint, owner=None):
+        if blueprint is None:
+            return self
+        if blueprint.resolve_tenant is not None and has_request_context():
+            tenant = blueprint.resolve_tenant()
+            if tenant is not None:
+                return getattr(tenant, self.tenant_attr)
+        if self.config_key is not None and has_app_context():
+            value = current_app.config.get(self.config_key)
+            if value:
+                return value
+        return blueprint.__dict__.get(self.name)
+
+    def __set__(self, blueprint, value):
+        blueprint.__dict__[self.name] = value
+
+
+class CognitoOAuth2ConsumerBlueprint(OAuth2ConsumerBlueprint):
+    """
+    OAuth2 blueprint that keeps its requests session per app request.
+
+    Flask-Dance caches the session on the blueprint, which is shared by all
+    threads. Its OAuth token is cached on the session as well, so concurrent
+    requests could end up using each other's tokens.
+
+    If resolve_tenant is set, it's called to get the CognitoTenant of the request,
+    whose Cognito endpoints and app client are used instead of the ones the
+    blueprint was created with.
+    """
+
+    resolve_tenant = None
+
+    base_url = TenantAttribute("base_url")
+    authorization_url = TenantAttribute("authorization_url")
+    token_url = TenantAttribute("token_url")
+    client_secret = TenantAttribute("client_secret", "COGNITO_OAUTH_CLIENT_SECRET")
+    _client_id = TenantAttribute("client_id", "COGNITO_OAUTH_CLIENT_ID")
+
+    @property
+    def app_client_id(self):
+        """
+        Client ID of the app client, unlike client_id without creating the OAuth
+        session.
+        """
+        return self._client_id
+
+    @property
+    def session(self):
+        if "cognito_oauth" not in g:
+            g.cognito_oauth = OAuth2ConsumerBlueprint.session.fget(self)
+        return g.cognito_oauth
+
+    def teardown_session(self, exception=None):
+        # The session lives on flask.g and is discarded with the app context
+        pass
+
+
 def make_cognito_blueprint(
     client_id=None,
     client_secret=None,
@@ -18,6 +98,7 @@ def make_cognito_blueprint(
     storage=None,
     domain=None,
     region=None,
+    resolve_tenant=None,
 ):
     """
     Make a blueprint for authenticating with Cognito using OAuth 2. This requires
@@ -47,6 +128,9 @@ def make_cognito_blueprint(
                 :class:`~flask_dance.consumer.storage.session.SessionStorage`.
         domain (str): The domain configured in Cognito
         region (str): The region of AWS
+        resolve_tenant (callable, optional): Returns the CognitoTenant of the
+            current request, whose domain and app client are used instead of
+            ``domain``, ``region``, ``client_id`` and ``client_secret``.
 
     :rtype: :class:`~flask_dance.consumer.OAuth2ConsumerBlueprint`
     :returns: A :ref:`blueprint <flask:blueprints>` to attach to your Flask app.
@@ -55,25 +139,26 @@ def make_cognito_blueprint(
     # There are more sophisticated checks, but for our purposes it should
     # strike a balance between accuracy and readability. The value of domain
     # is either just a prefix in Cognito or a FQDN.
-    custom_domain = "." in domain
+    custom_domain = domain is not None and "." in domain
 
-    if not custom_domain and region is None:
+    if resolve_tenant is None and not custom_domain and region is None:
         raise ValueError("The region parameter must be set if 'domain' is not a FQDN.")
 
     hostname = (
         f"{domain}.auth.{region}.amazoncognito.com" if region is not None else domain
     )
+    base_url = None if hostname is None else f"https://{hostname}"
 
     scope = scope or ["openid", "email", "phone", "profile"]
-    cognito_bp = OAuth2ConsumerBlueprint(
+    cognito_bp = CognitoOAuth2ConsumerBlueprint(
         "cognito",
         __name__,
         client_id=client_id,
         client_secret=client_secret,
         scope=scope,
-        base_url=f"https://{hostname}",
-        authorization_url=f"https://{hostname}/oauth2/authorize",
-        token_url=f"https://{hostname}/oauth2/token",
+        base_url=base_url,
+        authorization_url=f"{base_url}/oauth2/authorize" if base_url else None,
+        token_url=f"{base_url}/oauth2/token" if base_url else None,
         redirect_url=redirect_url,
         redirect_to=redirect_to,
         login_url=login_url,
@@ -81,14 +166,29 @@ def make_cognito_blueprint(
         session_class=session_class,
         storage=storage,
     )
-    cognito_bp.from_config["client_id"] = "COGNITO_OAUTH_CLIENT_ID"
-    cognito_bp.from_config["client_secret"] = "COGNITO_OAUTH_CLIENT_SECRET"
-
-    @cognito_bp.before_app_request
-    def set_applocal_session():
-        g.cognito_oauth = cognito_bp.session
+    # The app client is read from COGNITO_OAUTH_CLIENT_ID and
+    # COGNITO_OAUTH_CLIENT_SECRET when it's used, see TenantAttribute
+    if resolve_tenant is not None:
+        cognito_bp.resolve_tenant = resolve_tenant
 
     return cognito_bp
 
 
-cognito = LocalProxy(lambda: g.cognito_oauth)
+def id_token_claims(token: dict) -> dict:
+    """
+    Return the claims of the id_token in an OAuth token returned by Cognito.
+
+    The signature isn't verified, this is only meant for tokens that were just
+    received from the Cognito token endpoint.
+    """
+    try:
+        payload = token["id_token"].split(".")[1]
+        padding = "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload + padding))
+    except (KeyError, IndexError, TypeError, ValueError, binascii.Error):
+        return {}
+
+
+# The OAuth session is only created once a request uses it, requests that don't
+# check the login, e.g. health checks and static files, don't pay for it
+cognito = LocalProxy(lambda: current_app.blueprints["cognito"].session)
@@ -1,7 +1,27 @@
+import atexit
+import hashlib
+import logging
+import math
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import nullcontext
 from urllib.parse import quote
 
+import requests
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError, TokenExpiredError
-from dash import Dash
+from dash import Dash, callback_context
+
+try:
+    from dash import hooks
+except ImportError:  # Dash < 3
+    hooks = None
+from dash.development.base_component import ComponentRegistry
+from dash.exceptions import MissingCallbackContextException
 from flask import (
     redirect,
     request,
@@ -9,10 +29,91 @@ from flask import (
     Response,
     session,
     make_response,
+    g,
+    after_this_request,
+    current_app,
+    has_request_context,
 )
-from .cognito import make_cognito_blueprint, cognito
+from flask_dance.consumer import oauth_authorized
+from .cognito import make_cognito_blueprint, cognito, id_token_claims
 
+from .audit import AuditLog
 from .auth import Auth
+from .cache import TTLCache
+from .discovery import CognitoMetadata
+from .http_cache import ResponseCache, VolatilePart, revalidated
+from .ratelimit import RateLimiter
+from .session import CompactSessionInterface
+from .snapshot import CacheSnapshot
+from .tenants import TenantContext, TenantRegistry
+from .tokens import decode_jwt, verify_jwt_signature
+from .upstream import UpstreamLimiter, UpstreamOverloaded, UpstreamUnavailable
+
+log = logging.getLogger(__name__)
+
+TICKET_COOKIE_NAME = "cognito_ticket"
+
+# Answers of the user info endpoint that mean the token itself is invalid, and the
+# number of seconds such a result is cached at most
+INVALID_TOKEN_STATUSES = (400, 401, 403)
+INVALID_TOKEN_CACHE_TTL = 30
+
+# The config of the Dash index, which carries the signed end_id of the page load in
+# newer versions of Dash. Background callback handles are bound to it, so it has to
+# be issued for every response.
+DASH_CONFIG_PATTERN = re.compile(
+    rb'<script id="_dash-config" type="application/json">.*?</script>', re.DOTALL
+)
+
+# Set by the CognitoAuthMiddleware to the user of a verified ticket
+USER_ENVIRON_KEY = "dash_cognito_auth.user"
+
+# Number of new tenants whose warm-up can wait for the background thread
+TENANT_WARM_UP_QUEUE_SIZE = 64
+
+
+_user_hook_lock = threading.Lock()
+_user_hook_registered = False
+
+
+def cognito_user_data(_):
+    """
+    Snapshot of the verified user, copied into the context of background callbacks.
+    """
+    return g.get("cognito_user") if has_request_context() else None
+
+
+def register_user_hook() -> bool:
+    """
+    Register cognito_user_data as custom data hook of Dash, once per process.
+
+    Returns False if the installed version of Dash doesn't support it.
+    """
+    global _user_hook_registered  # pylint: disable=global-statement
+
+    if getattr(hooks, "custom_data", None) is None:
+        return False
+    with _user_hook_lock:
+        if not _user_hook_registered:
+            hooks.custom_data("cognito_user")(cognito_user_data)
+            _user_hook_registered = True
+    return True
+
+
+def current_user():
+    """
+    Return the user attributes of the current request.
+
+    Inside a background callback, which runs without a request, this is the user
+    that submitted the job.
+    """
+    if has_request_context() and "cognito_user" in g:
+        return g.cognito_user
+    try:
+        return callback_context.custom_data.get("cognito_user")
+    except (MissingCallbackContextException, AttributeError):
+        # Not in a callback or no custom data in this version of Dash
+        return None
 
 
 class CognitoOAuth(Auth):
@@ -23,11 +124,35 @@ class CognitoOAuth(Auth):
     def __init__(
         self,
         app: Dash,
-        domain: str,
+        domain: str = None,
         region=None,
         additional_scopes=None,
         logout_url: str = None,
         user_info_to_session_attr_mapping: dict[str, str] = None,
+        compact_session: bool = False,
+        allow_bearer_tokens: bool = False,
+        bearer_token_cache_ttl: int = 300,
+        ticket_ttl: int = None,
+        max_upstream_calls: int = None,
+        upstream_queue_size: int = None,
+        upstream_timeout: float = 5,
+        user_pool_id: str = None,
+        warm_up: bool = False,
+        metadata_cache_path: str = None,
+        health_url: str = None,
+        readiness_url: str = None,
+        audit_log=None,
+        rate_limiter: RateLimiter = None,
+        cache_index: bool = False,
+        cache_dash_metadata: bool = False,
+        background_job_ttl: int = None,
+        cache_snapshot_path: str = None,
+        cache_snapshot_interval: float = None,
+        tenants: TenantRegistry = None,
+        cache_max_bytes: int = None,
+        anonymous_max_age: int = None,
+        browser_login_only: bool = False,
+        upstream_call_timeout: float = 10,
     ):
         """
         Wrap a Dash App with Cognito authentication.
@@ -48,9 +173,10 @@ class CognitoOAuth(Auth):
         ----------
         app : Dash
             The app to add authentication to.
-        domain : str
+        domain : str, optional
             Either the domain prefix of the User Pool domain if hosted by Cognito
-            or the FQDN of your custom domain, e.g. authentication.example.com
+            or the FQDN of your custom domain, e.g. authentication.example.com.
+            Mandatory unless tenants is set
         region : str, optional
             AWS region of the User Pool. Mandatory if domain is NOT a custom domain, by default None
         additional_scopes : Additional OAuth Scopes to request, optional
@@ -70,17 +196,233 @@ class CognitoOAuth(Auth):
 
             it will take the subscriber-ID (sub) and add it as user_id to the session
             and additionally add the email and username.
+        compact_session : bool, optional
+            Replace the session interface of the Flask app with one that drops
+            token fields that aren't needed after login (e.g. the raw id_token)
+            from the session cookie, by default False
+        allow_bearer_tokens : bool, optional
+            Accept requests that carry a Cognito access token in an
+            "Authorization: Bearer <token>" header. Only access tokens issued to
+            the app client of the app are accepted, and their signature is
+            verified if the JWKS of the user pool is loaded (see user_pool_id).
+            These requests are validated against the Cognito user info endpoint,
+            never redirected and never create a session. The mapped user attributes are available in
+            flask.g.cognito_user instead, by default False
+        bearer_token_cache_ttl : int, optional
+            Number of seconds the result of validating a bearer token is cached,
+            i.e. how long a revoked token may still be accepted, by default 300
+        ticket_ttl : int, optional
+            After a successful check against Cognito, issue a signed ticket cookie
+            with the user attributes that is valid for this many seconds. Until it
+            expires, requests are authorized by verifying the ticket signature
+            instead of calling Cognito. Logging in again or logging out through
+            logout_url within that time removes the ticket.
+            By default None, i.e. no tickets.
+        max_upstream_calls : int, optional
+            Maximum number of concurrent calls this process makes to Cognito (user
+            info, bearer token validation and the token exchange after login).
+            Requests that can't get a slot are answered with a 503 and a
+            Retry-After header, by default None, i.e. unlimited
+        upstream_queue_size : int, optional
+            Number of requests that may wait for a free slot when
+            max_upstream_calls is reached, by default the same as max_upstream_calls
+        upstream_timeout : float, optional
+            Seconds a request waits for a free slot, by default 5
+        user_pool_id : str, optional
+            ID of the Cognito User Pool, e.g. eu-central-1_AbCdEf. Needed to load the
+            OpenID Connect discovery document and JWKS of the pool, by default None
+        warm_up : bool, optional
+            Load the discovery document and JWKS (if user_pool_id is set) and open
+            pooled connections to Cognito while the app is constructed, so the first
+            user after a deploy doesn't pay for DNS, TLS and metadata fetches.
+            Processes forked afterwards, e.g. with gunicorn --preload, drop the
+            inherited connections and warm up again in the background on their
+            first request. Failures are logged and don't prevent the app from
+            starting, by default False
+        metadata_cache_path : str, optional
+            File in which the discovery document and JWKS are cached for the next
+            start of the app, by default None
+        health_url : str, optional
+            Add an unauthenticated URL that answers load balancer health checks
+            without touching the session. Like logout_url it respects path
+            prefixes, by default None
+        readiness_url : str, optional
+            Add an unauthenticated URL that reports the state of the authentication,
+            i.e. whether the user pool metadata is loaded, the load on the calls to
+            Cognito and the cache statistics. It answers with a 503 until the user
+            pool metadata is loaded, if user_pool_id is set, and tries to load it
+            again with a growing delay between attempts, by default None
+        audit_log : AuditLog or callable, optional
+            Record logins, logouts, denied requests and token errors. The events
+            are queued and written in batches on a background thread, so the
+            request only pays for a non-blocking enqueue. A callable is wrapped in
+            an AuditLog and receives lists of events, by default None
+        rate_limiter : RateLimiter, optional
+            Limit the requests every user can make to the protected endpoints.
+            Requests over the limit are answered with a 429 before the wrapped
+            view runs, by default None
+        cache_index : bool, optional
+            Render the Dash index page once and serve the cached copy, with an ETag,
+            to every authorized user until the layout or config of the app changes.
+            If the Dash config of the page carries a per page load end_id, the
+            config is rendered for every response and no ETag is sent.
+            Not used with Dash pages, which render meta tags per path,
+            by default False
+        cache_dash_metadata : bool, optional
+            Serve _dash-layout and _dash-dependencies to authorized users with an
+            ETag and "Cache-Control: private, no-cache", answering with a 304 if
+            the browser's copy is still current. The dependencies are also only
+            serialized once, by default False
+        background_job_ttl : int, optional
+            Remember the user that first polls a Dash background callback job for
+            this many seconds. Later polls of the job from the same session are
+            authorized without calling Cognito, polls by other users are denied.
+            Also hands the user to the callback context, where current_user()
+            finds it inside background jobs (needs Dash 3 or later),
+            by default None
+        cache_snapshot_path : str, optional
+            File to which the bearer token and job owner caches are saved when the
+            process exits, and from which they're restored when the app is
+            constructed, so a restart doesn't send every active client to Cognito
+            at once. Entries keep their expiry times. The snapshot is signed with
+            the secret key of the Flask app. Processes sharing the file, e.g.
+            pre-forked workers, merge their entries into it, by default None
+        cache_snapshot_interval : float, optional
+            Also save the snapshot every this many seconds, for processes that may
+            be killed without running exit handlers. Each process starts saving
+            on its first request, by default None
+        tenants : TenantRegistry, optional
+            Serve several Cognito user pools from one app. The registry selects
+            the CognitoTenant of each request, e.g. by its host name, whose user
+            pool and app client are used instead of domain, region and the
+            COGNITO_OAUTH_CLIENT_* options. Requests that don't belong to a tenant
+            are answered with a 404, so the tenant has to be resolved from
+            something every request carries, like the host name, not the path.
+            Tickets, cached bearer tokens and job owners are only valid for the
+            tenant they were created for. With warm_up, new tenants are warmed up
+            on a background thread, by default None
+        cache_max_bytes : int, optional
+            Bound the approximate memory used by each of the bearer token and job
+            owner caches instead of their number of entries, evicting the least
+            recently used entries beyond it, by default None, i.e. each cache keeps
+            up to 1024 entries
+        anonymous_max_age : int, optional
+            Answer requests to the index that carry neither a cookie nor an
+            Authorization header with a prebuilt redirect to the login, without
+            checking the session. The redirect may be kept by shared caches for
+            this many seconds and varies by Cookie and Authorization,
+            by default None
+        browser_login_only : bool, optional
+            Only start the login, which stores the OAuth state in a new session,
+            for browser navigations, i.e. GET requests that accept text/html.
+            Other requests to the login URL, e.g. from crawlers and uptime checks,
+            are answered with a 401, by default False
+        upstream_call_timeout : float, optional
+            Seconds a call to Cognito (user info, bearer token validation and the
+            token exchange after login) may take. A call that times out frees its
+            upstream slot and the request is answered with a 503 and a
+            Retry-After header, by default 10
         """
+        if domain is None and tenants is None:
+            raise ValueError("Either domain or tenants must be set.")
+
         super().__init__(app)
 
-        self.user_info_to_session_attr_mapping = (
-            {"email": "email"}
-            if user_info_to_session_attr_mapping is None
-            else user_info_to_session_attr_mapping
-        )
+        self.user_info_to_session_attr_mapping = {
+            sys.intern(user_info_attr): sys.intern(session_attr)
+            for user_info_attr, session_attr in (
+                {"email": "email"}
+                if user_info_to_session_attr_mapping is None
+                else user_info_to_session_attr_mapping
+            ).items()
+        }
+        # Cached users are stored as tuples of their values in this order
+        self.session_attrs = tuple(self.user_info_to_session_attr_mapping.values())
 
         dash_base_path = app.get_relative_path("")
 
+        cognito_hostname = (
+            f"{domain}.auth.{region}.amazoncognito.com"
+            if region is not None
+            else domain
+        )
+        self.cognito_base_url = (
+            f"https://{cognito_hostname}" if cognito_hostname is not None else None
+        )
+        self.user_info_url = (
+            f"{self.cognito_base_url}/oauth2/userInfo"
+            if self.cognito_base_url is not None
+            else None
+        )
+        self.tenants = tenants
+        self.http_session = requests.Session()
+        self.metadata = (
+            CognitoMetadata(user_pool_id, cache_path=metadata_cache_path)
+            if user_pool_id is not None
+            else None
+        )
+
+        self.allow_bearer_tokens = allow_bearer_tokens
+        self.bearer_token_cache = TTLCache(
+            ttl=bearer_token_cache_ttl, maxbytes=cache_max_bytes
+        )
+
+        self.audit_log = (
+            audit_log
+            if audit_log is None or isinstance(audit_log, AuditLog)
+            else AuditLog(audit_log)
+        )
+
+        self.rate_limiter = rate_limiter
+
+        self.cache_index = cache_index and not app.use_pages
+        self.response_cache = ResponseCache()
+        self.cache_dash_metadata = cache_dash_metadata
+
+        self.job_owners = (
+            TTLCache(ttl=background_job_ttl, maxbytes=cache_max_bytes)
+            if background_job_ttl is not None
+            else None
+        )
+
+        if background_job_ttl is not None and not register_user_hook():
+            log.warning(
+                "This version of Dash doesn't support custom callback data, "
+                "current_user() won't work in background callbacks"
+            )
+
+        self.cache_snapshot = (
+            CacheSnapshot(cache_snapshot_path)
+            if cache_snapshot_path is not None
+            else None
+        )
+        self.cache_snapshot_interval = cache_snapshot_interval
+        self._cache_snapshot_pid = None
+        self._cache_snapshot_lock = threading.Lock()
+        if self.cache_snapshot is not None:
+            self.load_cache_snapshot()
+            atexit.register(self.save_cache_snapshot)
+            if cache_snapshot_interval is not None:
+                app.server.before_request(self.start_saving_cache_snapshot)
+
+        self.ticket_ttl = ticket_ttl
+        self._ticket_serializer = None
+
+        self.upstream_limiter = (
+            UpstreamLimiter(
+                max_upstream_calls,
+                max_waiting=upstream_queue_size,
+                timeout=upstream_timeout,
+            )
+            if max_upstream_calls is not None
+            else None
+        )
+        self.upstream_call_timeout = upstream_call_timeout
+        # Also handles UpstreamUnavailable
+        app.server.register_error_handler(
+            UpstreamOverloaded, self.handle_upstream_overloaded
+        )
+
         cognito_bp = make_cognito_blueprint(
             domain=domain,
             region=region,
@@ -91,75 +433,787 @@ class CognitoOAuth(Auth):
                 "profile",
             ]
             + (additional_scopes if additional_scopes else []),
+            resolve_tenant=self.tenant if tenants is not None else None,
         )
 
-        app.server.register_blueprint(cognito_bp, url_prefix=f"{dash_base_path}/login")
+        # Let the per-request OAuth sessions of Flask-Dance reuse our connection pool
+        cognito_bp.session_created = self.share_connection_pool
+        cognito_bp.token_url_params["timeout"] = upstream_call_timeout
+        app.server.register_blueprint(cognito_bp, url_prefix=self.app_url("login"))
 
-        if logout_url is not None:
-            logout_url = (
-                dash_base_path.removesuffix("/") + "/" + logout_url.removeprefix("/")
+        # The token exchange with Cognito happens in the authorized view
+        authorized_view = app.server.view_functions["cognito.authorized"]
+
+        def limited_authorized_view(*args, **kwargs):
+            with self.upstream_slot():
+                try:
+                    return authorized_view(*args, **kwargs)
+                except requests.RequestException as error:
+                    log.warning("Token exchange with Cognito failed: %s", error)
+                    raise UpstreamUnavailable() from error
+
+        app.server.view_functions["cognito.authorized"] = limited_authorized_view
+
+        with app.server.test_request_context():
+            self.login_path = url_for("cognito.login")
+        self.anonymous_max_age = anonymous_max_age
+
+        if browser_login_only:
+            login_view = app.server.view_functions["cognito.login"]
+
+            def browser_login_view(*args, **kwargs):
+                if not self.is_browser_navigation():
+                    return Response(status=401)
+                return login_view(*args, **kwargs)
+
+            app.server.view_functions["cognito.login"] = browser_login_view
+
+        @oauth_authorized.connect_via(cognito_bp)
+        def audit_login(_, token):
+            claims = id_token_claims(token)
+            self.audit(
+                "login",
+                user={
+                    session_attr: claims.get(user_info_attr)
+                    for user_info_attr, session_attr in (
+                        self.user_info_to_session_attr_mapping.items()
+                    )
+                },
             )
 
-            cognito_hostname = (
-                f"{domain}.auth.{region}.amazoncognito.com"
-                if region is not None
-                else domain
+        @oauth_authorized.connect_via(cognito_bp)
+        def reset_ticket(*_, **__):
+            # A ticket from before the login may belong to another user
+            if self.ticket_ttl is not None:
+                after_this_request(self.delete_ticket_cookie)
+
+        if compact_session:
+            app.server.session_interface = CompactSessionInterface(
+                token_key=f"{cognito_bp.name}_oauth_token"
             )
 
-            @app.server.route(logout_url)
+        if logout_url is not None:
+
+            @app.server.route(self.app_url(logout_url))
             def handle_logout():
+                self.audit(
+                    "logout",
+                    user={
+                        attr: session.get(attr)
+                        for attr in self.user_info_to_session_attr_mapping.values()
+                    },
+                )
 
                 post_logout_redirect = (
                     request.host_url.removesuffix("/") + dash_base_path
                 )
                 cognito_logout_url = (
-                    f"https://{cognito_hostname}/logout?"
+                    self.cognito_url("/logout?")
                     + f"client_id={cognito_bp.client_id}&logout_uri={quote(post_logout_redirect)}"
                 )
 
                 response = make_response(redirect(cognito_logout_url))
 
-                # Invalidate the session cookie
+                # Invalidate the session cookie and the authorization ticket
                 response.set_cookie("session", "empty", max_age=-3600)
-                return response
+                return self.delete_ticket_cookie(response)
+
+        if health_url is not None:
+            app.server.add_url_rule(
+                self.app_url(health_url), "cognito_health", self.health
+            )
+
+        if readiness_url is not None:
+            app.server.add_url_rule(
+                self.app_url(readiness_url), "cognito_readiness", self.readiness
+            )
+
+        if tenants is not None:
+            app.server.before_request(self.require_tenant)
+
+        self.warm_up_tenants = warm_up and tenants is not None
+        self._tenant_warm_ups = queue.Queue(maxsize=TENANT_WARM_UP_QUEUE_SIZE)
+        self._tenant_warm_up_thread = None
+        self._warm_up_pid = None
+        self._warm_up_lock = threading.Lock()
+        if warm_up:
+            self.warm_up()
+            app.server.before_request(self.warm_up_after_fork)
+
+    def app_url(self, url: str) -> str:
+        """
+        Prefix a URL with the base path of the Dash app.
+        """
+        return (
+            self.app.get_relative_path("").removesuffix("/")
+            + "/"
+            + url.removeprefix("/")
+        )
+
+    def health(self):
+        return {"status": "ok"}
+
+    def readiness(self):
+        # A saturated upstream is reported but doesn't make the instance unready,
+        # users with a ticket or cached bearer token can still be served.
+        # Metadata that failed to load, or wasn't loaded by a warm-up, is loaded
+        # again by the probes, with a growing delay between attempts.
+        ready = self.metadata is None or self.metadata.ensure_loaded(self.http_session)
+
+        return {
+            "ready": ready,
+            "metadata": {
+                "configured": self.metadata is not None,
+                "loaded": self.metadata is not None and self.metadata.loaded,
+            },
+            "upstream": (
+                self.upstream_limiter.stats()
+                if self.upstream_limiter is not None
+                else None
+            ),
+            "caches": {"bearer_tokens": self.bearer_token_cache.stats()},
+            "tenants": self.tenants.stats() if self.tenants is not None else None,
+            "audit_log": (
+                self.audit_log.stats() if self.audit_log is not None else None
+            ),
+        }, (200 if ready else 503)
+
+    def audit(self, event: str, **fields):
+        """
+        Record an authentication event for the current request in the audit log.
+        """
+        if self.audit_log is None:
+            return
+
+        if self.tenants is not None:
+            tenant = self.tenant()
+            fields.setdefault("tenant", tenant.name if tenant is not None else None)
+
+        self.audit_log.emit(
+            event,
+            path=request.path,
+            remote_addr=request.remote_addr,
+            **fields,
+        )
+
+    def tenant_context(self) -> TenantContext:
+        """
+        Context of the tenant of the current request, None if not in multi-tenant
+        mode or the request doesn't belong to a tenant.
+        """
+        if self.tenants is None:
+            return None
+        if "cognito_tenant" not in g:
+            context = self.tenants.context(request)
+            if context is not None and self.warm_up_tenants:
+                self.warm_up_tenant(context)
+            g.cognito_tenant = context
+        return g.cognito_tenant
+
+    def tenant(self):
+        """
+        CognitoTenant of the current request, see tenant_context.
+        """
+        context = self.tenant_context()
+        return context.tenant if context is not None else None
+
+    def tenant_key(self, key):
+        """
+        Qualify a cache key (str or bytes) with the tenant of the current request.
+        """
+        tenant = self.tenant()
+        if tenant is None:
+            return key
+        if isinstance(key, bytes):
+            return tenant.name.encode("utf-8") + b":" + key
+        return f"{tenant.name}:{key}"
+
+    def require_tenant(self):
+        if request.endpoint in ("cognito_health", "cognito_readiness"):
+            return None
+        if self.tenant_context() is None:
+            return Response(status=404)
+        return None
+
+    def cognito_url(self, path: str) -> str:
+        """
+        URL of a Cognito endpoint of the user pool of the current request.
+        """
+        tenant = self.tenant()
+        base_url = tenant.base_url if tenant is not None else self.cognito_base_url
+        return base_url + path
+
+    def snapshot_caches(self) -> dict[str, TTLCache]:
+        caches = {"bearer_tokens": self.bearer_token_cache}
+        if self.job_owners is not None:
+            caches["job_owners"] = self.job_owners
+        return caches
+
+    def load_cache_snapshot(self) -> int:
+        # Cached users are tuples in the order of session_attrs, which have to
+        # match for a snapshot to be restored
+        restored = self.cache_snapshot.load(
+            self.snapshot_caches(), self.app.server.secret_key, self.session_attrs
+        )
+        log.info(
+            "Restored %d cache entries from %s", restored, self.cache_snapshot.path
+        )
+        return restored
+
+    def save_cache_snapshot(self):
+        try:
+            self.cache_snapshot.save(
+                self.snapshot_caches(), self.app.server.secret_key, self.session_attrs
+            )
+        except (OSError, ValueError) as error:
+            log.warning(
+                "Could not save cache snapshot %s: %s", self.cache_snapshot.path, error
+            )
+
+    def start_saving_cache_snapshot(self):
+        """
+        Start saving the cache snapshot periodically on the first request of each
+        process. A timer started when the app is constructed wouldn't run in
+        workers forked afterwards, e.g. with gunicorn --preload.
+        """
+        if self._cache_snapshot_pid == os.getpid():
+            return None
+
+        with self._cache_snapshot_lock:
+            if self._cache_snapshot_pid == os.getpid():
+                return None
+            self._cache_snapshot_pid = os.getpid()
+
+        self.cache_snapshot.save_periodically(
+            self.save_cache_snapshot, self.cache_snapshot_interval
+        )
+        return None
+
+    def share_connection_pool(self, oauth_session):
+        oauth_session.mount("https://", self.http_session.get_adapter("https://"))
+        return oauth_session
+
+    def warm_up(self):
+        """
+        Load the user pool metadata and open a pooled connection to Cognito.
+        """
+        self._warm_up_pid = os.getpid()
+        if self.metadata is not None and not self.metadata.loaded:
+            self.metadata.load(self.http_session)
+
+        if self.cognito_base_url is not None:
+            self.open_connection(self.cognito_base_url)
+
+    def warm_up_after_fork(self):
+        """
+        Warm up again on the first request of a process forked after the warm-up,
+        e.g. a worker of gunicorn --preload. The pooled connections inherited
+        from the parent would otherwise share one TLS socket between workers.
+        """
+        if self._warm_up_pid == os.getpid():
+            return None
+
+        with self._warm_up_lock:
+            if self._warm_up_pid == os.getpid():
+                return None
+            # Only drops this process' copies of the sockets
+            self.http_session.close()
+            self._warm_up_pid = os.getpid()
+
+        threading.Thread(
+            target=self.warm_up, name="cognito-warm-up", daemon=True
+        ).start()
+        return None
+
+    def warm_up_tenant(self, context: TenantContext):
+        """
+        Queue the warm-up of a tenant seen for the first time, or again after its
+        context was evicted. A single background thread works through the queue,
+        so the tenant's first request doesn't wait for it and a burst of new
+        tenants doesn't start a thread for each. If the queue is full, a later
+        request of the tenant queues it again.
+        """
+        if context.warming_up:
+            return
+
+        with self._warm_up_lock:
+            if context.warming_up:
+                return
+            try:
+                self._tenant_warm_ups.put_nowait(context)
+            except queue.Full:
+                return
+            context.warming_up = True
+
+            # Also restarts the thread in processes forked after it was started
+            if (
+                self._tenant_warm_up_thread is None
+                or not self._tenant_warm_up_thread.is_alive()
+            ):
+                self._tenant_warm_up_thread = threading.Thread(
+                    target=self.run_tenant_warm_ups,
+                    name="cognito-tenant-warm-up",
+                    daemon=True,
+                )
+                self._tenant_warm_up_thread.start()
+
+    def run_tenant_warm_ups(self):
+        while True:
+            context = self._tenant_warm_ups.get()
+            if context.metadata is not None:
+                context.metadata.load(self.http_session)
+            self.open_connection(context.tenant.base_url)
+            self._tenant_warm_ups.task_done()
+
+    def open_connection(self, url: str):
+        try:
+            self.http_session.head(url, timeout=5)
+        except requests.RequestException as error:
+            log.warning("Could not connect to %s: %s", url, error)
 
     def is_authorized(self):
+        if self.ticket_ttl is not None and self.verify_ticket():
+            return True
+
         if not cognito.authorized:
             # send to cognito login
             return False
 
         try:
-            resp = cognito.get("/oauth2/userInfo")
+            with self.upstream_slot():
+                try:
+                    resp = cognito.get(
+                        "/oauth2/userInfo", timeout=self.upstream_call_timeout
+                    )
+                except requests.RequestException as error:
+                    log.warning("User info request to Cognito failed: %s", error)
+                    raise UpstreamUnavailable() from error
+
+            # Cognito rejects tokens that were revoked or expired in the meantime
+            if resp.status_code in (400, 401, 403):
+                self.audit("token_error", error=f"HTTP {resp.status_code}")
+                return False
             assert resp.ok, resp.text
 
-            for (
-                user_info_attr,
-                session_attr,
-            ) in self.user_info_to_session_attr_mapping.items():
-                session[session_attr] = resp.json()[user_info_attr]
+            user_info = resp.json()
+            g.cognito_user = self.map_user_info(user_info)
+            session.update(g.cognito_user)
+
+            if self.ticket_ttl is not None:
+                self.issue_ticket(user_info["sub"], g.cognito_user)
+
+            return True
+        except (InvalidGrantError, TokenExpiredError) as error:
+            # Not authorized, index_auth_wrapper sends the user to the login again
+            self.audit("token_error", error=type(error).__name__)
+            return False
+
+    def upstream_slot(self):
+        """
+        Context manager to wrap calls to Cognito in, bounded by the upstream limiter.
+        """
+        if self.upstream_limiter is None:
+            return nullcontext()
+        return self.upstream_limiter.slot()
+
+    def handle_upstream_overloaded(self, error: UpstreamOverloaded):
+        return Response(status=503, headers={"Retry-After": str(error.retry_after)})
+
+    def ticket_serializer(self) -> URLSafeTimedSerializer:
+        secret_key = self.app.server.secret_key
+        if (
+            self._ticket_serializer is None
+            or self._ticket_serializer.secret_key != secret_key
+        ):
+            self._ticket_serializer = URLSafeTimedSerializer(
+                secret_key, salt="dash-cognito-auth-ticket"
+            )
+        return self._ticket_serializer
+
+    def issue_ticket(self, sub: str, user: dict):
+        """
+        Attach a signed authorization ticket for the user to the response.
+        """
+        payload = {"sub": sub, "user": user}
+        tenant = self.tenant()
+        if tenant is not None:
+            payload["tenant"] = tenant.name
+
+        ticket = self.ticket_serializer().dumps(payload)
+        interface = current_app.session_interface
+
+        @after_this_request
+        def set_ticket_cookie(response):
+            response.set_cookie(
+                TICKET_COOKIE_NAME,
+                ticket,
+                max_age=self.ticket_ttl,
+                path=interface.get_cookie_path(current_app),
+                domain=interface.get_cookie_domain(current_app),
+                secure=interface.get_cookie_secure(current_app),
+                httponly=True,
+                samesite=interface.get_cookie_samesite(current_app),
+            )
+            return response
+
+    def delete_ticket_cookie(self, response):
+        interface = current_app.session_interface
+        response.delete_cookie(
+            TICKET_COOKIE_NAME,
+            path=interface.get_cookie_path(current_app),
+            domain=interface.get_cookie_domain(current_app),
+        )
+        return response
+
+    def verify_ticket(self) -> bool:
+        """
+        Authorize the request based on its ticket cookie, which is pure CPU work.
+        """
+        user = request.environ.get(USER_ENVIRON_KEY)
+        if user is None:
+            tenant = self.tenant()
+            user = self.load_ticket(
+                request.cookies.get(TICKET_COOKIE_NAME),
+                tenant=tenant.name if tenant is not None else None,
+            )
+        if user is None:
+            return False
+
+        g.cognito_user = user
+        return True
+
+    def load_ticket(self, ticket: str, tenant: str = None):
+        """
+        Return the user of a ticket if it's validly signed, not expired and was
+        issued for the tenant.
+        """
+        if not ticket:
+            return None
+
+        try:
+            payload = self.ticket_serializer().loads(ticket, max_age=self.ticket_ttl)
+        except BadSignature:
+            return None
+        if payload.get("tenant") != tenant:
+            return None
+        return payload["user"]
+
+    def map_user_info(self, user_info: dict) -> dict:
+        """
+        Map the Cognito user info to the configured session attributes.
+        """
+        return {
+            session_attr: user_info[user_info_attr]
+            for user_info_attr, session_attr in self.user_info_to_session_attr_mapping.items()
+        }
+
+    def pack_user(self, user: dict) -> tuple:
+        """
+        Compact representation of the user attributes for caching, without the
+        attribute names.
+        """
+        return tuple(user.get(attr) for attr in self.session_attrs)
+
+    def unpack_user(self, values: tuple) -> dict:
+        return dict(zip(self.session_attrs, values))
+
+    def bearer_token(self):
+        """
+        Return the bearer token of the current request, if bearer tokens are allowed
+        and the request carries one.
+        """
+        if not self.allow_bearer_tokens:
+            return None
+
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            return None
+        return token.strip()
+
+    def is_bearer_authorized(self, token: str) -> bool:
+        """
+        Validate a Cognito access token against the user info endpoint.
+
+        Only access tokens issued to the app client of the app are accepted, see
+        access_token_claims. Both valid and invalid tokens are cached, so repeated
+        calls with the same token don't reach Cognito until the cache entry
+        expires, at the latest when the token does. Invalid tokens are cached for
+        at most INVALID_TOKEN_CACHE_TTL seconds, and failures of Cognito itself,
+        e.g. throttling, aren't cached at all.
+        """
+        key = self.tenant_key(hashlib.sha256(token.encode("utf-8")).digest())
+        user = self.bearer_token_cache.get(key)
+
+        if user is None:
+            try:
+                claims = self.access_token_claims(token)
+            except ValueError as error:
+                self.audit("token_error", error=str(error))
+                claims, user = None, False
+
+            if claims is not None:
+                try:
+                    with self.upstream_slot():
+                        resp = self.http_session.get(
+                            self.cognito_url("/oauth2/userInfo"),
+                            headers={"Authorization": f"Bearer {token}"},
+                            timeout=self.upstream_call_timeout,
+                        )
+                except requests.RequestException:
+                    # Don't cache, the token may well be valid
+                    return False
+
+                if resp.status_code in INVALID_TOKEN_STATUSES:
+                    user = False
+                elif not resp.ok:
+                    # Throttled (429) or failed, the token may well be valid
+                    return False
+                else:
+                    try:
+                        user = self.pack_user(self.map_user_info(resp.json()))
+                    except KeyError as error:
+                        # The scope of the token doesn't cover a mapped attribute
+                        self.audit("token_error", error=f"missing attribute {error}")
+                        user = False
+                    except ValueError:
+                        # Not JSON, don't cache
+                        self.audit("token_error", error="invalid user info")
+                        return False
+
+            if user is False:
+                ttl = min(INVALID_TOKEN_CACHE_TTL, self.bearer_token_cache.ttl)
+            else:
+                ttl = min(claims["exp"] - time.time(), self.bearer_token_cache.ttl)
+            self.bearer_token_cache.set(key, user, ttl=ttl)
+
+        if user is False:
+            return False
+
+        g.cognito_user = self.unpack_user(user)
+        return True
+
+    def access_token_claims(self, token: str) -> dict:
+        """
+        Return the claims of a bearer token after the checks that don't need
+        Cognito.
+
+        Raises a ValueError if the token isn't an unexpired Cognito access token
+        issued to the app client of the app (or of the tenant of the request), or
+        if the JWKS of the user pool is loaded and the token isn't signed with it.
+        Tokens of other app clients of the same user pool are accepted by the
+        user info endpoint, but not by the browser login of the app.
+        """
+        _, claims = decode_jwt(token)
+
+        if claims.get("token_use") != "access":
+            raise ValueError("not an access token")
+        if claims.get("client_id") != current_app.blueprints["cognito"].app_client_id:
+            raise ValueError("issued to another app client")
+        if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] <= (
+            time.time()
+        ):
+            raise ValueError("expired")
+
+        metadata = self.user_pool_metadata()
+        if metadata is not None and metadata.loaded:
+            if claims.get("iss") != metadata.issuer or not verify_jwt_signature(
+                token, metadata.jwks
+            ):
+                raise ValueError("invalid signature")
+
+        return claims
+
+    def user_pool_metadata(self):
+        """
+        CognitoMetadata of the user pool of the current request, if configured.
+        """
+        context = self.tenant_context()
+        return context.metadata if context is not None else self.metadata
+
+    def session_credential(self):
+        """
+        Fingerprint of the unexpired access token in the session, if there is one.
+        """
+        token = cognito.token or {}
+        if not token.get("access_token") or token.get("expires_at", math.inf) < (
+            time.time()
+        ):
+            return None
+        return hashlib.sha256(token["access_token"].encode("utf-8")).digest()
+
+    def is_job_owner(self) -> bool:
+        """
+        Authorize a poll of a background callback job by the session that owns it.
+        """
+        job = request.args.get("job")
+        if self.job_owners is None or not job:
+            return False
+
+        owner = self.job_owners.get(self.tenant_key(job))
+        if owner is None:
+            return False
+
+        credential, user = owner
+        if credential is None or credential != self.session_credential():
+            return False
+
+        g.cognito_user = self.unpack_user(user)
+        return True
 
+    def claim_job(self) -> bool:
+        """
+        Record the user of a background callback poll as the owner of its job.
+
+        Returns False if the job is owned by another user.
+        """
+        job = request.args.get("job")
+        if self.job_owners is None or not job:
             return True
-        except (InvalidGrantError, TokenExpiredError):
-            return self.login_request()
+
+        user = self.pack_user(g.get("cognito_user", {}))
+        owner = self.job_owners.get(self.tenant_key(job))
+        if owner is not None and owner[1] != user:
+            return False
+
+        # Also refresh the credential of the owner after its access token was
+        # renewed, so polls don't need Cognito once the old token expired
+        credential = self.session_credential()
+        if owner is None or (credential is not None and credential != owner[0]):
+            self.job_owners.set(self.tenant_key(job), (credential, user))
+        return True
+
+    def bearer_unauthorized(self):
+        return Response(
+            status=401, headers={"WWW-Authenticate": 'Bearer error="invalid_token"'}
+        )
 
     def login_request(self):
         # send to cognito auth page
-        return redirect(url_for("cognito.login"))
+        return Response(
+            status=302, headers={"Location": request.script_root + self.login_path}
+        )
+
+    def is_anonymous(self) -> bool:
+        """
+        Whether the request carries no credentials at all, i.e. no cookies and no
+        Authorization header.
+        """
+        environ = request.environ
+        return "HTTP_COOKIE" not in environ and "HTTP_AUTHORIZATION" not in environ
+
+    def anonymous_login_request(self):
+        """
+        Redirect to the login that shared caches may serve to anonymous requests.
+        """
+        response = self.login_request()
+        response.cache_control.public = True
+        response.cache_control.max_age = self.anonymous_max_age
+        response.vary.update(("Cookie", "Authorization"))
+        return response
+
+    def is_browser_navigation(self) -> bool:
+        if request.method != "GET":
+            return False
+        mode = request.headers.get("Sec-Fetch-Mode")
+        if mode is not None:
+            return mode == "navigate"
+        return "text/html" in request.headers.get("Accept", "")
 
     def auth_wrapper(self, f):
         def wrap(*args, **kwargs):
-            if not self.is_authorized():
+            token = self.bearer_token()
+            if token is not None:
+                if not self.is_bearer_authorized(token):
+                    self.audit("denied", status=401)
+                    return self.bearer_unauthorized()
+            elif not (self.is_job_owner() or self.is_authorized()):
+                self.audit("denied", status=403)
+                return Response(status=403)
+
+            if not self.claim_job():
+                self.audit("denied", status=403, job=request.args["job"])
                 return Response(status=403)
 
+            if self.rate_limiter is not None:
+                retry_after = self.rate_limiter.check(
+                    g.get("cognito_user", {}), request.url_rule.rule
+                )
+                if retry_after:
+                    return Response(
+                        status=429,
+                        headers={"Retry-After": str(math.ceil(retry_after))},
+                    )
+
+            if self.cache_dash_metadata:
+                return self.serve_dash_metadata(f, *args, **kwargs)
+
             response = f(*args, **kwargs)
             return response
 
         return wrap
 
+    def index_fingerprint(self):
+        """
+        Cache key of the rendered index page, changes with the title, index string
+        and config of the app and the component libraries whose scripts it loads.
+        The layout itself isn't part of the page, it's loaded from _dash-layout.
+        """
+        return (
+            self.app.title,
+            self.app.index_string,
+            repr(self.app.config),
+            tuple(ComponentRegistry.registry),
+        )
+
+    def serve_index(self, original_index, *args, **kwargs):
+        if not self.cache_index:
+            return original_index(*args, **kwargs)
+
+        return self.response_cache.respond(
+            "index",
+            self.index_fingerprint(),
+            lambda: original_index(*args, **kwargs),
+            volatile=VolatilePart(
+                DASH_CONFIG_PATTERN,
+                # pylint: disable-next=protected-access
+                lambda: self.app._generate_config_html().encode("utf-8"),
+                lambda config: b'"end_id"' in config,
+            ),
+        )
+
+    def serve_dash_metadata(self, view, *args, **kwargs):
+        """
+        Serve _dash-layout and _dash-dependencies as revalidated private responses.
+        """
+        prefix = self.app.config.routes_pathname_prefix
+        rule = request.url_rule.rule
+
+        if rule == f"{prefix}_dash-layout":
+            # Layout functions may render something different for every user and
+            # static layouts may be changed in place, so the layout is serialized
+            # for every request and the ETag is the hash of its content
+            return revalidated(view(*args, **kwargs))
+        if rule != f"{prefix}_dash-dependencies":
+            return view(*args, **kwargs)
+
+        return self.response_cache.respond(
+            rule, len(self.app.callback_map), lambda: view(*args, **kwargs)
+        )
+
     def index_auth_wrapper(self, original_index):
         def wrap(*args, **kwargs):
+            if self.anonymous_max_age is not None and self.is_anonymous():
+                return self.anonymous_login_request()
+
+            token = self.bearer_token()
+            if token is not None:
+                if not self.is_bearer_authorized(token):
+                    self.audit("denied", status=401)
+                    return self.bearer_unauthorized()
+                return self.serve_index(original_index, *args, **kwargs)
+
             if self.is_authorized():
-                return original_index(*args, **kwargs)
+                return self.serve_index(original_index, *args, **kwargs)
             else:
                 return self.login_request()
 
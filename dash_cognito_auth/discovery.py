@@ -0,0 +1,128 @@
+"""
+OpenID Connect discovery metadata of a Cognito user pool.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+log = logging.getLogger(__name__)
+
+# Delays between attempts to load the metadata after a failure, doubling from
+# the first to the last
+MIN_RETRY_DELAY = 1
+MAX_RETRY_DELAY = 60
+
+
+class CognitoMetadata:
+    """
+    Discovery document and JWKS of a Cognito user pool.
+
+    The metadata can be cached in a local file, so a restarted process doesn't
+    have to fetch it again before serving the first user.
+    """
+
+    def __init__(
+        self, user_pool_id: str, cache_path: str = None, cache_max_age: int = 86400
+    ):
+        # User pool IDs are prefixed with their region, e.g. eu-central-1_AbCdEf
+        region = user_pool_id.split("_")[0]
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.discovery_url = f"{self.issuer}/.well-known/openid-configuration"
+        self.cache_path = cache_path
+        self.cache_max_age = cache_max_age
+        self.discovery = None
+        self.jwks = None
+        self.retry_delay = MIN_RETRY_DELAY
+        self.retry_at = 0
+        self._retry_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.discovery is not None and self.jwks is not None
+
+    def load_cache(self) -> bool:
+        """
+        Load the metadata from the cache file if it exists and isn't too old.
+        """
+        if self.cache_path is None:
+            return False
+
+        try:
+            if time.time() - os.path.getmtime(self.cache_path) > self.cache_max_age:
+                return False
+            with open(self.cache_path, "rt", encoding="utf-8") as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+
+        self.discovery = cached["discovery"]
+        self.jwks = cached["jwks"]
+        return True
+
+    def save_cache(self):
+        if self.cache_path is None or not self.loaded:
+            return
+
+        # Write to a temporary file first so concurrent workers never read a
+        # partially written cache.
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wt", encoding="utf-8") as cache_file:
+            json.dump({"discovery": self.discovery, "jwks": self.jwks}, cache_file)
+        os.replace(tmp_path, self.cache_path)
+
+    def fetch(self, http_session: requests.Session, timeout: float = 5):
+        """
+        Fetch the discovery document and JWKS from Cognito and update the cache.
+        """
+        resp = http_session.get(self.discovery_url, timeout=timeout)
+        resp.raise_for_status()
+        discovery = resp.json()
+
+        resp = http_session.get(discovery["jwks_uri"], timeout=timeout)
+        resp.raise_for_status()
+
+        self.discovery = discovery
+        self.jwks = resp.json()
+        self.save_cache()
+
+    def load(self, http_session: requests.Session, timeout: float = 5) -> bool:
+        """
+        Load the metadata from the cache or, if that's not possible, from Cognito.
+
+        Failures are logged and not raised, authentication doesn't depend on the
+        metadata.
+        """
+        if self.load_cache():
+            return True
+
+        try:
+            self.fetch(http_session, timeout=timeout)
+        except (requests.RequestException, ValueError, KeyError, OSError) as error:
+            log.warning(
+                "Could not load Cognito metadata from %s: %s", self.issuer, error
+            )
+            self.retry_at = time.monotonic() + self.retry_delay
+            self.retry_delay = min(self.retry_delay * 2, MAX_RETRY_DELAY)
+            return False
+        return True
+
+    def ensure_loaded(self, http_session: requests.Session, timeout: float = 5) -> bool:
+        """
+        Load the metadata if it isn't loaded yet, unless the last attempt failed
+        too recently or another thread is loading it already.
+        """
+        if self.loaded:
+            return True
+        if time.monotonic() < self.retry_at:
+            return False
+        if not self._retry_lock.acquire(blocking=False):
+            return False
+        try:
+            return self.loaded or self.load(http_session, timeout=timeout)
+        finally:
+            self._retry_lock.release()
@@ -0,0 +1,122 @@
+"""
+Caching of responses that don't depend on the user, served behind the auth check.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Callable, NamedTuple
+
+from flask import current_app, request
+
+
+class VolatilePart(NamedTuple):
+    """
+    Part of a cached body that's rendered again for every response, e.g. a token
+    that's issued per page load. Only matches for which volatile returns True
+    are rendered again.
+    """
+
+    pattern: re.Pattern
+    render: Callable[[], bytes]
+    volatile: Callable[[bytes], bool] = lambda part: True
+
+
+class CachedResponse(NamedTuple):
+    key: object
+    body: bytes
+    mimetype: str
+    etag: str
+    # If a volatile part was found, body is the text before it and tail the text
+    # after it, and etag is None
+    tail: bytes = None
+
+
+class ResponseCache:
+    """
+    Keeps the last rendered response of views whose output only changes with the
+    app itself, e.g. after the layout or config was replaced.
+
+    Responses are served with an ETag and "Cache-Control: private, no-cache", so
+    browsers revalidate on every load (which passes the auth check again) and
+    receive a 304 if nothing changed. Shared caches never store them. Responses
+    with a volatile part differ every time, they're served without an ETag.
+
+    Only successful responses are cached, errors and redirects are served as
+    rendered.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key, render, volatile: VolatilePart = None):
+        """
+        Return the cached response for name, rendering it again if key changed.
+
+        Responses that aren't a 200 are returned as they are, without caching them.
+        """
+        entry = self._entries.get(name)
+        if entry is not None and entry.key == key:
+            return entry
+
+        response = current_app.make_response(render())
+        if response.status_code != 200:
+            return response
+
+        body = response.get_data()
+        match = volatile.pattern.search(body) if volatile is not None else None
+        if match is not None and volatile.volatile(match.group()):
+            entry = CachedResponse(
+                key=key,
+                body=body[: match.start()],
+                mimetype=response.mimetype,
+                etag=None,
+                tail=body[match.end() :],
+            )
+        else:
+            entry = CachedResponse(
+                key=key,
+                body=body,
+                mimetype=response.mimetype,
+                etag=hashlib.sha1(body).hexdigest(),
+            )
+        with self._lock:
+            self._entries[name] = entry
+        return entry
+
+    def respond(self, name: str, key, render, volatile: VolatilePart = None):
+        """
+        Serve the cached response for name, as a 304 if the client has it already.
+        """
+        entry = self.get(name, key, render, volatile)
+        if not isinstance(entry, CachedResponse):
+            return entry
+
+        if entry.tail is not None:
+            response = current_app.response_class(
+                entry.body + volatile.render() + entry.tail, mimetype=entry.mimetype
+            )
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        return revalidated(response)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def revalidated(response):
+    """
+    Mark a response as private and to be revalidated on every use, answering
+    with a 304 if the client's copy matches its ETag.
+    """
+    response = current_app.make_response(response)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -0,0 +1,118 @@
+"""
+WSGI middleware that rejects unauthenticated requests before Flask dispatches them.
+"""
+
+from http.cookies import SimpleCookie
+
+from itsdangerous import BadSignature
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Request, Response
+
+from .cognito_oauth import TICKET_COOKIE_NAME, USER_ENVIRON_KEY, CognitoOAuth
+
+# Endpoints that have to be reachable without being logged in
+PUBLIC_ENDPOINTS = {
+    "cognito.login",
+    "cognito.authorized",
+    "handle_logout",
+    "cognito_health",
+    "cognito_readiness",
+}
+
+
+class CognitoAuthMiddleware:
+    """
+    Checks the credentials of a request before the Flask app gets to see it.
+
+    Requests with a valid ticket are passed on with the user of the ticket in
+    ``environ["dash_cognito_auth.user"]``, which CognitoOAuth trusts without
+    checking again. Requests with a bearer token (if allowed) or a session that
+    holds an OAuth token are passed on to be checked by CognitoOAuth. All other
+    requests are anonymous and answered right away, without a Flask request
+    context or session: the index with a redirect to the login, everything else
+    with a 403. The login, logout and probe endpoints remain public.
+
+    Install it on the Flask server of the Dash app:
+
+        app.server.wsgi_app = CognitoAuthMiddleware(auth)
+
+    or pass ``wsgi_app`` to put it in front of several apps, e.g. a
+    :class:`werkzeug.middleware.dispatcher.DispatcherMiddleware`.
+    """
+
+    def __init__(self, auth: CognitoOAuth, wsgi_app=None, public_paths=()):
+        server = auth.app.server
+        self.auth = auth
+        self.server = server
+        self.wsgi_app = server.wsgi_app if wsgi_app is None else wsgi_app
+
+        self.public_paths = set(public_paths)
+        for rule in server.url_map.iter_rules():
+            if rule.endpoint in PUBLIC_ENDPOINTS:
+                self.public_paths.add(rule.rule)
+
+        self.index_path = auth.app.config.routes_pathname_prefix
+        self.login_path = auth.login_path
+
+        self.session_cookie_name = server.config["SESSION_COOKIE_NAME"]
+        self.token_key = "cognito_oauth_token"
+
+    def has_oauth_session(self, cookie: str) -> bool:
+        """
+        Whether the session cookie is validly signed and holds an OAuth token.
+        """
+        interface = self.server.session_interface
+        if not hasattr(interface, "get_signing_serializer"):
+            # Server-side sessions can't be checked without a lookup
+            return True
+
+        serializer = interface.get_signing_serializer(self.server)
+        if serializer is None:
+            return False
+
+        max_age = int(self.server.permanent_session_lifetime.total_seconds())
+        try:
+            data = serializer.loads(cookie, max_age=max_age)
+        except BadSignature:
+            return False
+        return self.token_key in data
+
+    def authenticate(self, environ) -> bool:
+        cookies = SimpleCookie(environ.get("HTTP_COOKIE", ""))
+
+        ticket = cookies.get(TICKET_COOKIE_NAME)
+        if ticket is not None and self.auth.ticket_ttl is not None:
+            tenant = None
+            if self.auth.tenants is not None:
+                tenant = self.auth.tenants.resolve(Request(environ))
+            user = self.auth.load_ticket(
+                ticket.value, tenant=tenant.name if tenant is not None else None
+            )
+            if user is not None:
+                environ[USER_ENVIRON_KEY] = user
+                return True
+
+        if self.auth.allow_bearer_tokens and environ.get(
+            "HTTP_AUTHORIZATION", ""
+        ).lower().startswith("bearer "):
+            return True
+
+        session_cookie = cookies.get(self.session_cookie_name)
+        return session_cookie is not None and self.has_oauth_session(
+            session_cookie.value
+        )
+
+    def __call__(self, environ, start_response):
+        # Never trust an identity that didn't come from this middleware
+        environ.pop(USER_ENVIRON_KEY, None)
+
+        path = environ.get("PATH_INFO", "")
+        if path in self.public_paths or self.authenticate(environ):
+            return self.wsgi_app(environ, start_response)
+
+        if path == self.index_path:
+            script_name = environ.get("SCRIPT_NAME", "")
+            response = redirect(script_name + self.login_path)
+        else:
+            response = Response(status=403)
+        return response(environ, start_response)
@@ -0,0 +1,162 @@
+"""
+Per-user rate limiting of the protected endpoints.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from redis.exceptions import TimeoutError as RedisTimeoutError
+
+    REDIS_ERRORS = (RedisConnectionError, RedisTimeoutError)
+except ImportError:  # redis is optional
+    REDIS_ERRORS = (ConnectionError, TimeoutError)
+
+log = logging.getLogger(__name__)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets kept in the memory of this process.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from the bucket for key.
+
+        Returns 0 if a token was available, else the number of seconds until
+        the next one will be.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+class RedisBucketStore:
+    """
+    Token buckets kept in Redis, shared by all processes and hosts.
+
+    Expects a client of the redis package, e.g. ``redis.Redis()``. Every check is
+    a single round trip running a Lua script, which uses the clock of the Redis
+    server so the clocks of the app servers don't matter.
+
+    If Redis can't be reached or doesn't answer in time, requests are let through
+    instead of failing, rate limiting is only a protection against excessive use.
+    """
+
+    SCRIPT = """
+    local time = redis.call("TIME")
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = (1 - tokens) / rate
+    end
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+    redis.call("EXPIRE", KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(retry_after)
+    """
+
+    def __init__(self, client, prefix: str = "dash-cognito-auth:ratelimit:"):
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(self._script(keys=[self.prefix + key], args=[rate, burst]))
+        except REDIS_ERRORS as error:
+            log.warning(
+                "Rate limit check failed, letting the request through: %s", error
+            )
+            return 0
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter keyed by the identity of the logged in user.
+
+    Parameters
+    ----------
+    rate : float
+        Number of requests per second a user may make on average
+    burst : int
+        Number of requests a user may make at once
+    key : str, optional
+        Session attribute (see user_info_to_session_attr_mapping) that identifies
+        the user, by default "email"
+    routes : dict[str, tuple[float, int] | None], optional
+        Separate (rate, burst) limits for URL rules, e.g.
+        {"/_dash-update-component": (5, 20)}. Each of these routes has its own
+        bucket, None exempts a route from rate limiting, by default None
+    store : MemoryBucketStore or RedisBucketStore, optional
+        Where the buckets are kept, by default in the memory of this process
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        key: str = "email",
+        routes: dict = None,
+        store=None,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.routes = routes or {}
+        self.store = MemoryBucketStore() if store is None else store
+        self.limited = 0
+
+    def check(self, user: dict, rule: str) -> float:
+        """
+        Count a request of the user to the URL rule.
+
+        Returns 0 if the request is allowed, else the seconds until it would be.
+        """
+        identity = user.get(self.key)
+        if identity is None:
+            return 0
+
+        if rule in self.routes:
+            limits = self.routes[rule]
+            if limits is None:
+                return 0
+            rate, burst = limits
+            bucket = f"{identity}:{rule}"
+        else:
+            rate, burst = self.rate, self.burst
+            bucket = str(identity)
+
+        retry_after = self.store.take(bucket, rate, burst)
+        if retry_after:
+            self.limited += 1
+        return retry_after
@@ -0,0 +1,56 @@
+"""
+Compact encoding for the Flask session cookie that carries the Cognito auth state.
+"""
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface
+
+# Fields of the OAuth token that are not needed once the user is logged in.
+# The claims of the id_token end up in the session via the user info mapping
+# and expires_in is superseded by the expires_at value Flask-Dance adds.
+DEFAULT_DROPPED_TOKEN_FIELDS = ("id_token", "expires_in")
+
+
+class CompactSessionSerializer(TaggedJSONSerializer):
+    """
+    Session serializer that strips unused OAuth token fields before the payload
+    is signed.
+
+    The payload isn't compressed here, the signing serializer of Flask already
+    zlib-compresses it whenever that makes it shorter. Cookies written by the
+    default Flask serializer are still accepted, so switching doesn't log out
+    existing users.
+    """
+
+    def __init__(
+        self,
+        token_key: str = "cognito_oauth_token",
+        dropped_token_fields=DEFAULT_DROPPED_TOKEN_FIELDS,
+    ):
+        super().__init__()
+        self.token_key = token_key
+        self.dropped_token_fields = frozenset(dropped_token_fields)
+
+    def dumps(self, value) -> bytes:
+        token = value.get(self.token_key)
+        if isinstance(token, dict) and not self.dropped_token_fields.isdisjoint(token):
+            value = dict(value)
+            value[self.token_key] = {
+                key: val
+                for key, val in token.items()
+                if key not in self.dropped_token_fields
+            }
+
+        return super().dumps(value).encode("utf-8")
+
+    def loads(self, value):
+        return super().loads(value.decode("utf-8"))
+
+
+class CompactSessionInterface(SecureCookieSessionInterface):
+    """
+    Signed cookie session interface using the :class:`CompactSessionSerializer`.
+    """
+
+    def __init__(self, **serializer_kwargs):
+        self.serializer = CompactSessionSerializer(**serializer_kwargs)
@@ -0,0 +1,169 @@
+"""
+Snapshots of the in-memory caches that survive a restart of the process.
+"""
+
+import hashlib
+import hmac
+import logging
+import marshal
+import mmap
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .cache import TTLCache
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"DCAS3"
+
+
+class CacheSnapshot:
+    """
+    Stores the unexpired entries of TTL caches in a local file.
+
+    The entries are serialized with marshal, which only handles plain data and
+    loads fast, and signed with an HMAC of the secret key, because they hold
+    authorization decisions. The file is memory-mapped for loading, so restoring
+    doesn't copy it into memory first. Entries keep their expiry times, a restored
+    entry expires when it would have in the process that saved it.
+
+    The schema passed to save and load describes the format of the cached values,
+    e.g. the attribute names of cached users. It's stored in the signed payload
+    and snapshots saved with another schema aren't restored.
+
+    Several processes, e.g. pre-forked workers, can share a snapshot file. Each
+    save merges the unexpired entries already in the file with those of the
+    saving process, whose entries win, so the file holds the caches of all of
+    them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._timer = None
+
+    @staticmethod
+    def signature(secret_key, payload) -> bytes:
+        if not secret_key:
+            raise ValueError("a secret key is needed to sign cache snapshots")
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode("utf-8")
+        return hmac.new(secret_key, payload, hashlib.sha256).digest()
+
+    def save(self, caches: dict[str, TTLCache], secret_key, schema=None):
+        """
+        Write the entries of the caches to the snapshot file, merged with the
+        unexpired entries other processes saved to it.
+        """
+        # Raises before touching any file if there's no secret key
+        self.signature(secret_key, b"")
+
+        # Serializes the merges of processes saving at the same time
+        with open(f"{self.path}.lock", "wb") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            saved = self.read(secret_key, schema) or {}
+            wall_now = time.time()
+            entries = {}
+            for name, cache in caches.items():
+                merged = {
+                    key: (key, expires_at, value)
+                    for key, expires_at, value in saved.get(name, ())
+                    if expires_at > wall_now
+                }
+                merged.update((entry[0], entry) for entry in cache.snapshot())
+                entries[name] = list(merged.values())
+
+            payload = marshal.dumps((schema, entries))
+            signature = self.signature(secret_key, payload)
+
+            # Write to a temporary file first so concurrent workers never read a
+            # partially written snapshot.
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as snapshot_file:
+                snapshot_file.write(MAGIC + signature + payload)
+            os.replace(tmp_path, self.path)
+
+    def load(self, caches: dict[str, TTLCache], secret_key, schema=None) -> int:
+        """
+        Restore the caches from the snapshot file, if it exists, is valid and was
+        saved with the same schema.
+
+        Returns the number of restored entries.
+        """
+        if not secret_key:
+            log.warning(
+                "Not loading cache snapshot %s, the app has no secret key", self.path
+            )
+            return 0
+
+        entries = self.read(secret_key, schema)
+        if entries is None:
+            return 0
+
+        return sum(
+            cache.restore(entries.get(name, ())) for name, cache in caches.items()
+        )
+
+    def read(self, secret_key, schema=None) -> dict:
+        """
+        Return the entries of the snapshot file by cache name, None if it doesn't
+        exist, is invalid or was saved with another schema.
+        """
+        header = len(MAGIC) + hashlib.sha256().digest_size
+        try:
+            with open(self.path, "rb") as snapshot_file, mmap.mmap(
+                snapshot_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as data:
+                payload = memoryview(data)[header:]
+                try:
+                    valid = data[: len(MAGIC)] == MAGIC and hmac.compare_digest(
+                        data[len(MAGIC) : header], self.signature(secret_key, payload)
+                    )
+                    snapshot = marshal.loads(payload) if valid else None
+                finally:
+                    payload.release()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError) as error:
+            log.info("Could not load cache snapshot %s: %s", self.path, error)
+            return None
+
+        if snapshot is None:
+            log.warning("Ignoring cache snapshot %s, invalid signature", self.path)
+            return None
+
+        saved_schema, entries = snapshot
+        if saved_schema != schema:
+            log.warning(
+                "Ignoring cache snapshot %s, saved with schema %r instead of %r",
+                self.path,
+                saved_schema,
+                schema,
+            )
+            return None
+
+        return entries
+
+    def save_periodically(self, save, interval: float):
+        """
+        Call save every interval seconds on a background thread.
+        """
+
+        def run():
+            save()
+            self.save_periodically(save, interval)
+
+        self._timer = threading.Timer(interval, run)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
@@ -0,0 +1,133 @@
+"""
+Multi-tenant mode, in which the Cognito user pool is selected per request.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from .discovery import CognitoMetadata
+
+
+class CognitoTenant(NamedTuple):
+    """
+    User pool and app client of a tenant.
+
+    domain and region have the same meaning as for CognitoOAuth.
+    """
+
+    name: str
+    domain: str
+    region: str = None
+    client_id: str = None
+    client_secret: str = None
+    user_pool_id: str = None
+
+    @property
+    def hostname(self) -> str:
+        if self.region is None:
+            return self.domain
+        return f"{self.domain}.auth.{self.region}.amazoncognito.com"
+
+    @property
+    def base_url(self) -> str:
+        return f"https://{self.hostname}"
+
+    @property
+    def authorization_url(self) -> str:
+        return f"{self.base_url}/oauth2/authorize"
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.base_url}/oauth2/token"
+
+
+class TenantContext:
+    """
+    State of a tenant that is kept between requests.
+    """
+
+    def __init__(self, tenant: CognitoTenant):
+        self.tenant = tenant
+        self.metadata = (
+            CognitoMetadata(tenant.user_pool_id)
+            if tenant.user_pool_id is not None
+            else None
+        )
+        # Set once the warm-up of the tenant was queued, see CognitoOAuth.warm_up_tenant
+        self.warming_up = False
+
+
+class TenantRegistry:
+    """
+    Selects the tenant of each request and keeps the contexts of the most
+    recently used tenants.
+
+    The tenant is resolved for every request, including the login, authorized and
+    logout URLs and the _dash-* endpoints of Dash, which don't carry the path of
+    the page. Resolvers therefore have to select the tenant by something all
+    requests of a tenant share, e.g. the host name (see tenants_by_host), not by
+    the path.
+
+    Parameters
+    ----------
+    resolve : callable
+        Called with the request, returns its CognitoTenant or None if the request
+        doesn't belong to a known tenant. See tenants_by_host.
+    max_tenants : int, optional
+        Number of tenant contexts that are kept, the least recently used one is
+        dropped when a new tenant exceeds it, by default 256
+    """
+
+    def __init__(self, resolve, max_tenants: int = 256):
+        self.resolve = resolve
+        self.max_tenants = max_tenants
+        self.evictions = 0
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def context(self, request) -> TenantContext:
+        """
+        Return the context of the tenant of the request, None if it has none.
+        """
+        tenant = self.resolve(request)
+        if tenant is None:
+            return None
+
+        with self._lock:
+            context = self._contexts.get(tenant.name)
+            if context is None or context.tenant != tenant:
+                context = TenantContext(tenant)
+                self._contexts[tenant.name] = context
+            self._contexts.move_to_end(tenant.name)
+            while len(self._contexts) > self.max_tenants:
+                self._contexts.popitem(last=False)
+                self.evictions += 1
+
+        return context
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "max_tenants": self.max_tenants,
+            "evictions": self.evictions,
+        }
+
+
+def tenants_by_host(tenants: dict[str, CognitoTenant]):
+    """
+    Resolver for a TenantRegistry that selects the tenant by the host name of
+    the request, e.g. {"customer.example.com": CognitoTenant(...)}.
+    """
+
+    def resolve(request):
+        host = request.host.lower()
+        if not host.endswith("]"):
+            # Strip the port, except from bare IPv6 addresses
+            host = host.rpartition(":")[0] or host
+        return tenants.get(host)
+
+    return resolve
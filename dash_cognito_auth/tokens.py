@@ -0,0 +1,78 @@
+"""
+Decoding and signature verification of the JWTs issued by Cognito.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+
+# DER encoded DigestInfo of SHA-256 that precedes the digest in an RS256
+# signature, see RFC 8017 section 9.2
+SHA256_DIGEST_INFO = bytes.fromhex("3031300d060960864801650304020105000420")
+
+
+def b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def decode_jwt(token: str) -> tuple[dict, dict]:
+    """
+    Return the header and claims of a JWT without verifying its signature.
+
+    Raises a ValueError if the token isn't a JWT.
+    """
+    try:
+        header, claims, _ = token.split(".")
+        header, claims = json.loads(b64decode(header)), json.loads(b64decode(claims))
+    except (ValueError, binascii.Error) as error:
+        raise ValueError("not a JWT") from error
+    if not isinstance(header, dict) or not isinstance(claims, dict):
+        raise ValueError("not a JWT")
+    return header, claims
+
+
+def verify_jwt_signature(token: str, jwks: dict) -> bool:
+    """
+    Verify the RS256 signature of a JWT with the key of the JWKS named in its
+    header.
+
+    Cognito only signs with RS256, whose verification only needs modular
+    exponentiation, so no cryptography library is needed. The decrypted
+    signature is compared to the complete expected encoding instead of being
+    parsed, which is the safe way to verify RSASSA-PKCS1-v1_5 signatures.
+    """
+    try:
+        header_b64, claims_b64, signature_b64 = token.split(".")
+        header, _ = decode_jwt(token)
+        if header.get("alg") != "RS256":
+            return False
+
+        key = next(
+            key
+            for key in jwks.get("keys", ())
+            if key.get("kid") == header.get("kid") and key.get("kty") == "RSA"
+        )
+        modulus = int.from_bytes(b64decode(key["n"]), "big")
+        exponent = int.from_bytes(b64decode(key["e"]), "big")
+        signature = b64decode(signature_b64)
+    except (StopIteration, KeyError, ValueError, binascii.Error):
+        return False
+
+    size = (modulus.bit_length() + 7) // 8
+    signature_value = int.from_bytes(signature, "big")
+    if len(signature) != size or signature_value >= modulus:
+        return False
+
+    digest_info = (
+        SHA256_DIGEST_INFO
+        + hashlib.sha256(f"{header_b64}.{claims_b64}".encode("ascii")).digest()
+    )
+    padding = size - 3 - len(digest_info)
+    if padding < 8:
+        return False
+    expected = b"\x00\x01" + b"\xff" * padding + b"\x00" + digest_info
+
+    decrypted = pow(signature_value, exponent, modulus).to_bytes(size, "big")
+    return hmac.compare_digest(decrypted, expected)
@@ -0,0 +1,102 @@
+"""
+Limits for the calls this process makes to Cognito.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class UpstreamOverloaded(Exception):
+    """
+    Raised when a call to Cognito can't get a slot in time.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many concurrent Cognito calls, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class UpstreamUnavailable(UpstreamOverloaded):
+    """
+    Raised when a call to Cognito fails or doesn't answer in time.
+    """
+
+    def __init__(self, retry_after: int = 5):
+        Exception.__init__(self, f"Cognito is unavailable, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """
+    Bounds the number of concurrent calls to Cognito.
+
+    Callers that don't get a slot immediately wait in a bounded queue for at most
+    timeout seconds. If the queue is full or the timeout passes,
+    :class:`UpstreamOverloaded` is raised so the request can fail fast instead of
+    tying up a worker thread.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_waiting: int = None,
+        timeout: float = 5,
+        retry_after: int = 5,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_concurrent if max_waiting is None else max_waiting
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.max_concurrent
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "saturated": self.saturated,
+        }
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        raise UpstreamOverloaded(self.retry_after)
+
+    @contextmanager
+    def slot(self):
+        """
+        Context manager that holds a slot for the duration of an upstream call.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                queue_full = self.waiting >= self.max_waiting
+                if not queue_full:
+                    self.waiting += 1
+            if queue_full:
+                self._reject()
+
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                self._reject()
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
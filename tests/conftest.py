@@ -3,8 +3,13 @@ Shared test fixtures.
 """
 
 # pylint: disable=W0621
-from typing import Iterator
-from unittest.mock import patch
+import base64
+import hashlib
+import json
+import time
+from http import HTTPStatus
+from typing import Callable, Iterator
+from unittest.mock import MagicMock, patch
 
 import pytest
 
@@ -16,6 +21,24 @@ from dash_cognito_auth import CognitoOAuth
 
 load_dotenv()
 
+# RSA key with which the access tokens of the tests are signed
+TEST_KEY_ID = "test-key"
+TEST_KEY_MODULUS = int(
+    "b11f1bb7d03d82cdea4e84b1691b335febee55638765083b8cac116dc85fd913"
+    "74328a873f7a01843da8a021794881319ebc5e8b509bdf151bfdf40570661ef2"
+    "d393492131ebcc2d79e8925517b4b009b181a9027c780e95a5c60dbb7d57a120"
+    "6bf715402b607139919ba7a0517563f208a1ad4d69158dcfd7288d26322a5f93",
+    16,
+)
+TEST_KEY_PRIVATE_EXPONENT = int(
+    "93e3d69fff372cfdc433356670cd6e731c2b0f8f202102e3be0c7a2d014ece91"
+    "08c79e955932050c26f3a268f0bcd26add10899ca77ccea2f09175ec08b2ac09"
+    "4eefc455688e45bdbab67389f663e87c0e700b484bf2fe3a9b41db3c7bcb83d3"
+    "3248fb6e22a68a0ec1f0295f9383d0a2b8601e3a6830a54d16b701551de77139",
+    16,
+)
+TEST_KEY_EXPONENT = 65537
+
 
 @pytest.fixture
 def app(name="dash") -> Dash:
@@ -108,7 +131,17 @@ def app_with_auth_and_cognito_custom_domain(app) -> CognitoOAuth:
 
 
 @pytest.fixture
-def authorized_app(app) -> Iterator[CognitoOAuth]:
+def authorized_app_options() -> dict:
+    """
+    Additional CognitoOAuth arguments for authorized_app, override it in a test
+    module to test options behind the authorization.
+    """
+
+    return {}
+
+
+@pytest.fixture
+def authorized_app(app, authorized_app_options: dict) -> Iterator[CognitoOAuth]:
     """
     App with Cognito Based authentication that bypasses the authentication/authorization
     part, i.e. replaced is_authorized and the authorized endpoint.
@@ -131,8 +164,114 @@ def authorized_app(app) -> Iterator[CognitoOAuth]:
         authorized_call,
     ):
 
-        auth = CognitoOAuth(app, domain="test", region="eu-central-1")
+        auth = CognitoOAuth(
+            app, domain="test", region="eu-central-1", **authorized_app_options
+        )
         auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
         auth.app.server.config["COGNITO_OAUTH_CLIENT_SCRET"] = "testsecret"
 
         yield auth
+
+
+@pytest.fixture
+def user_info() -> Callable[..., MagicMock]:
+    """
+    Factory of responses of the Cognito user info endpoint. Keyword arguments are
+    the attributes of the user, status is the HTTP status of the response.
+    """
+
+    def make(status: int = HTTPStatus.OK, **attributes) -> MagicMock:
+        response = MagicMock()
+        response.status_code = status
+        response.ok = status < 400
+        response.json.return_value = attributes
+        return response
+
+    return make
+
+
+@pytest.fixture
+def stub_cognito(user_info) -> Iterator[MagicMock]:
+    """
+    Logged in Cognito session with an unexpired access token whose user info
+    endpoint returns the user 1234 with the email user@example.com.
+    """
+
+    stub = MagicMock()
+    stub.authorized = True
+    stub.token = {"access_token": "a", "expires_at": time.time() + 3600}
+    stub.get.return_value = user_info(sub="1234", email="user@example.com")
+
+    with patch("dash_cognito_auth.cognito_oauth.cognito", stub):
+        yield stub
+
+
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def _int_b64encode(value: int) -> str:
+    return _b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+@pytest.fixture
+def jwks() -> dict:
+    """
+    JWKS with the public part of the key the test access tokens are signed with.
+    """
+
+    return {
+        "keys": [
+            {
+                "kid": TEST_KEY_ID,
+                "kty": "RSA",
+                "alg": "RS256",
+                "use": "sig",
+                "n": _int_b64encode(TEST_KEY_MODULUS),
+                "e": _int_b64encode(TEST_KEY_EXPONENT),
+            }
+        ]
+    }
+
+
+@pytest.fixture
+def access_token() -> Callable[..., str]:
+    """
+    Factory of Cognito access tokens for the app client "testclient", signed with
+    the key of the jwks fixture. Keyword arguments override the claims.
+    """
+
+    def make(**claims) -> str:
+        header = {"kid": TEST_KEY_ID, "alg": "RS256"}
+        claims = {
+            "sub": "1234",
+            "token_use": "access",
+            "client_id": "testclient",
+            "iss": "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_AbCdEf",
+            "exp": int(time.time()) + 3600,
+            **claims,
+        }
+        signing_input = ".".join(
+            _b64encode(json.dumps(part).encode("utf-8")) for part in (header, claims)
+        )
+
+        size = (TEST_KEY_MODULUS.bit_length() + 7) // 8
+        digest_info = (
+            bytes.fromhex("3031300d060960864801650304020105000420")
+            + hashlib.sha256(signing_input.encode("ascii")).digest()
+        )
+        encoded = (
+            b"\x00\x01"
+            + b"\xff" * (size - 3 - len(digest_info))
+            + b"\x00"
+            + digest_info
+        )
+        signature = pow(
+            int.from_bytes(encoded, "big"),
+            TEST_KEY_PRIVATE_EXPONENT,
+            TEST_KEY_MODULUS,
+        ).to_bytes(size, "big")
+
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    return make
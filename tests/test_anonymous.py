@@ -0,0 +1,119 @@
+"""
+Test the lean handling of anonymous requests.
+"""
+
+# pylint: disable=W0621
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+
+from dash import Dash
+
+from dash_cognito_auth import CognitoOAuth
+
+
+@pytest.fixture
+def lean_app(app: Dash) -> CognitoOAuth:
+    """
+    App with a cacheable anonymous redirect that only lets browsers log in.
+    """
+
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        anonymous_max_age=300,
+        browser_login_only=True,
+    )
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_SECRET"] = "testsecret"
+    return auth
+
+
+def test_that_anonymous_requests_get_a_cacheable_redirect(lean_app: CognitoOAuth):
+    """
+    Requests without cookies are redirected without looking at the session.
+    """
+
+    # Arrange
+    client = lean_app.app.server.test_client()
+
+    # Act
+    with patch.object(CognitoOAuth, "is_authorized") as is_authorized:
+        response = client.get("/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FOUND
+    assert response.headers["Location"] == "/login/cognito"
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+    assert set(response.vary) == {"Cookie", "Authorization"}
+    assert "Set-Cookie" not in response.headers
+    is_authorized.assert_not_called()
+
+
+def test_that_requests_with_cookies_are_checked(lean_app: CognitoOAuth):
+    """
+    Requests that may belong to a logged in user are authorized as usual.
+    """
+
+    # Arrange
+    client = lean_app.app.server.test_client()
+    client.set_cookie("session", "something")
+
+    # Act
+    with patch.object(CognitoOAuth, "is_authorized", return_value=True):
+        response = client.get("/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert "public" not in response.headers.get("Cache-Control", "")
+
+
+def test_that_only_browsers_start_the_login(lean_app: CognitoOAuth):
+    """
+    The OAuth state is only stored in a session for browser navigations.
+    """
+
+    # Arrange
+    client = lean_app.app.server.test_client(use_cookies=False)
+
+    # Act
+    browser = client.get("/login/cognito", headers={"Accept": "text/html,*/*"})
+    crawler = client.get("/login/cognito", headers={"Accept": "*/*"})
+    uptime_check = client.head("/login/cognito", headers={"Accept": "text/html"})
+    fetch = client.get(
+        "/login/cognito", headers={"Accept": "text/html", "Sec-Fetch-Mode": "cors"}
+    )
+
+    # Assert
+    assert browser.status_code == HTTPStatus.FOUND
+    assert "Set-Cookie" in browser.headers
+    for response in (crawler, uptime_check, fetch):
+        assert response.status_code == HTTPStatus.UNAUTHORIZED
+        assert "Set-Cookie" not in response.headers
+
+
+def test_that_the_oauth_session_is_only_created_when_used(app: Dash):
+    """
+    Requests that don't need Cognito don't create an OAuth session.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(app, domain="test", region="eu-central-1", health_url="healthz")
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_SECRET"] = "testsecret"
+    blueprint = auth.app.server.blueprints["cognito"]
+    client = auth.app.server.test_client()
+
+    # Act
+    with patch.object(
+        blueprint, "session_created", side_effect=lambda session: session
+    ) as session_created:
+        client.get("/healthz")
+        health_sessions = session_created.call_count
+        client.get("/_dash-layout")
+
+    # Assert
+    assert health_sessions == 0
+    assert session_created.call_count == 1
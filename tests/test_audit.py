@@ -0,0 +1,142 @@
+"""
+Test the asynchronous audit log of authentication events.
+"""
+
+import base64
+import json
+import threading
+from http import HTTPStatus
+from unittest.mock import patch
+
+from flask import Flask, redirect
+from flask_dance.consumer import oauth_authorized
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.audit import AuditLog, JsonlFileSink
+
+
+def test_that_events_are_written_in_batches():
+    """
+    Events are handed to the sink in batches on the background thread.
+    """
+
+    # Arrange
+    batches = []
+    audit_log = AuditLog(batches.append, batch_size=10, flush_interval=0.05)
+
+    # Act
+    for number in range(25):
+        audit_log.emit("denied", number=number)
+    audit_log.flush()
+
+    # Assert
+    events = [event for batch in batches for event in batch]
+    assert [event["number"] for event in events] == list(range(25))
+    assert all(len(batch) <= 10 for batch in batches)
+    assert audit_log.stats()["written"] == 25
+
+
+def test_that_events_are_dropped_when_the_queue_is_full():
+    """
+    A slow sink never blocks the caller, excess events are dropped and counted.
+    """
+
+    # Arrange
+    writing, release = threading.Event(), threading.Event()
+
+    def slow_sink(_):
+        writing.set()
+        release.wait(5)
+
+    audit_log = AuditLog(slow_sink, max_queue_size=2, flush_interval=0)
+    audit_log.emit("denied")
+    writing.wait(5)
+
+    # Act
+    for _ in range(10):
+        audit_log.emit("denied")
+    release.set()
+    audit_log.flush()
+
+    # Assert
+    assert audit_log.dropped == 8
+    assert audit_log.written == 3
+
+
+def test_that_the_jsonl_sink_appends_events(tmp_path):
+    """
+    The JSONL sink writes one JSON document per line.
+    """
+
+    # Arrange
+    path = tmp_path / "audit.jsonl"
+    sink = JsonlFileSink(str(path))
+
+    # Act
+    sink([{"event": "login"}])
+    sink([{"event": "logout"}])
+
+    # Assert
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["event"] for line in lines] == ["login", "logout"]
+
+
+def test_that_denied_requests_are_audited(app):
+    """
+    A 403 from the auth wrapper is recorded with the path.
+    """
+
+    # Arrange
+    events = []
+    auth = CognitoOAuth(
+        app, domain="test", region="eu-central-1", audit_log=events.extend
+    )
+    flask_server: Flask = auth.app.server
+    client = flask_server.test_client()
+
+    # Act
+    response = client.get("/_dash-layout")
+    auth.audit_log.flush()
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert events[0]["event"] == "denied"
+    assert events[0]["status"] == 403
+    assert events[0]["path"] == "/_dash-layout"
+
+
+def test_that_logins_are_audited_with_the_id_token_claims(app):
+    """
+    After the token exchange the login is recorded with the mapped user attributes.
+    """
+
+    # Arrange
+    events = []
+    claims = base64.urlsafe_b64encode(
+        json.dumps({"sub": "1234", "email": "user@example.com"}).encode()
+    ).decode()
+    token = {"access_token": "a", "id_token": f"header.{claims}.signature"}
+
+    def authorized_call(blueprint):
+        oauth_authorized.send(blueprint, token=token)
+        return redirect("/")
+
+    with patch(
+        "flask_dance.consumer.oauth2.OAuth2ConsumerBlueprint.authorized",
+        authorized_call,
+    ):
+        auth = CognitoOAuth(
+            app,
+            domain="test",
+            region="eu-central-1",
+            audit_log=AuditLog(events.extend, flush_interval=0.01),
+        )
+    client = auth.app.server.test_client()
+
+    # Act
+    client.get("/login/cognito/authorized?code=abc&state=def")
+    auth.audit_log.flush()
+
+    # Assert
+    assert events[0]["event"] == "login"
+    assert events[0]["user"] == {"email": "user@example.com"}
@@ -3,10 +3,12 @@ Test the various auth flows and ensure that authentication happens.
 """
 
 from http import HTTPStatus
+from unittest.mock import MagicMock, patch
 from urllib.parse import parse_qs, urlparse
 
 
 from flask import Flask
+from oauthlib.oauth2.rfc6749.errors import TokenExpiredError
 
 from dash_cognito_auth.cognito_oauth import CognitoOAuth
 
@@ -157,3 +159,50 @@ def test_that_cognito_handler_redirects_to_user_pool_with_custom_domain(
     assert parsed_qs["redirect_uri"][0] == "http://localhost/login/cognito/authorized"
     assert parsed_qs["client_id"][0] == "testclient"
     assert "state" in parsed_qs
+
+
+def test_that_an_expired_token_is_not_authorized(app_with_auth: CognitoOAuth):
+    """
+    If the token expired, protected endpoints answer with a 403 and the index
+    sends the user to the login again.
+    """
+
+    # Arrange
+    flask_server: Flask = app_with_auth.app.server
+    client = flask_server.test_client()
+    stub = MagicMock()
+    stub.authorized = True
+    stub.get.side_effect = TokenExpiredError()
+
+    # Act
+    with patch("dash_cognito_auth.cognito_oauth.cognito", stub):
+        layout_response = client.get("/_dash-layout")
+        index_response = client.get("/")
+
+    # Assert
+    assert layout_response.status_code == HTTPStatus.FORBIDDEN
+    assert index_response.status_code == HTTPStatus.FOUND
+    assert index_response.headers.get("Location") == "/login/cognito"
+
+
+def test_that_a_token_rejected_by_cognito_is_not_authorized(
+    app_with_auth: CognitoOAuth,
+):
+    """
+    If Cognito rejects a token, e.g. because it was revoked, protected endpoints
+    answer with a 403 instead of failing.
+    """
+
+    # Arrange
+    flask_server: Flask = app_with_auth.app.server
+    client = flask_server.test_client()
+    stub = MagicMock()
+    stub.authorized = True
+    stub.get.return_value.status_code = HTTPStatus.UNAUTHORIZED
+
+    # Act
+    with patch("dash_cognito_auth.cognito_oauth.cognito", stub):
+        response = client.get("/_dash-layout")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
@@ -0,0 +1,188 @@
+"""
+Test the identity handed to background callbacks and the checks of their polls.
+"""
+
+# pylint: disable=W0621
+import time
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dash import Dash, Input, Output, callback_context, dcc, html
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from flask import Flask, g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cognito_oauth import current_user
+
+
+@pytest.fixture
+def job_app(app: Dash) -> CognitoOAuth:
+    """
+    App that remembers job owners and has a /poll endpoint returning the user.
+    """
+
+    @app.server.route("/poll")
+    def poll():
+        return g.cognito_user
+
+    return CognitoOAuth(
+        app, domain="test", region="eu-central-1", background_job_ttl=60
+    )
+
+
+def test_that_polls_of_a_job_skip_cognito(job_app: CognitoOAuth, stub_cognito):
+    """
+    Only the first poll of a job is checked against Cognito.
+    """
+
+    # Arrange
+    client = job_app.app.server.test_client()
+
+    # Act
+    responses = [client.get("/poll?job=1234~abc") for _ in range(5)]
+
+    # Assert
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    assert responses[-1].json == {"email": "user@example.com"}
+    assert stub_cognito.get.call_count == 1
+
+
+def test_that_other_users_cant_poll_a_job(
+    job_app: CognitoOAuth, stub_cognito, user_info
+):
+    """
+    A poll of a job owned by another user is denied.
+    """
+
+    # Arrange
+    client = job_app.app.server.test_client()
+    client.get("/poll?job=1234~abc")
+
+    # Act
+    stub_cognito.token = {"access_token": "b", "expires_at": time.time() + 3600}
+    stub_cognito.get.return_value = user_info(sub="5678", email="other@example.com")
+    response = client.get("/poll?job=1234~abc")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert stub_cognito.get.call_count == 2
+
+
+def test_that_an_expired_token_is_checked_again(job_app: CognitoOAuth, stub_cognito):
+    """
+    Once the access token of the session expired, polls go to Cognito again.
+    """
+
+    # Arrange
+    client = job_app.app.server.test_client()
+    client.get("/poll?job=1234~abc")
+
+    # Act
+    stub_cognito.token["expires_at"] = time.time() - 1
+    response = client.get("/poll?job=1234~abc")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert stub_cognito.get.call_count == 2
+
+
+def test_that_a_renewed_token_of_the_owner_skips_cognito_again(
+    job_app: CognitoOAuth, stub_cognito
+):
+    """
+    After the owner's access token was renewed, only the first poll with the new
+    token is checked against Cognito.
+    """
+
+    # Arrange
+    client = job_app.app.server.test_client()
+    client.get("/poll?job=1234~abc")
+
+    # Act
+    stub_cognito.token = {"access_token": "renewed", "expires_at": time.time() + 3600}
+    responses = [client.get("/poll?job=1234~abc") for _ in range(3)]
+
+    # Assert
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    assert stub_cognito.get.call_count == 2
+
+
+def test_that_callbacks_receive_the_user(app: Dash, stub_cognito):
+    """
+    The verified user is part of the callback context copied into background jobs.
+    """
+
+    # Arrange
+    app.layout = html.Div([dcc.Input(id="name"), html.Div(id="greeting")])
+
+    @app.callback(Output("greeting", "children"), Input("name", "value"))
+    def greet(_):
+        return callback_context.custom_data["cognito_user"]["email"]
+
+    auth = CognitoOAuth(
+        app, domain="test", region="eu-central-1", background_job_ttl=60
+    )
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.post(
+        "/_dash-update-component",
+        json={
+            "output": "greeting.children",
+            "outputs": {"id": "greeting", "property": "children"},
+            "inputs": [{"id": "name", "property": "value", "value": "x"}],
+            "changedPropIds": ["name.value"],
+            "state": [],
+        },
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert "user@example.com" in response.get_data(as_text=True)
+
+
+def test_that_the_user_hook_is_only_registered_for_background_jobs(app: Dash):
+    """
+    Apps that don't use background_job_ttl don't register a Dash hook.
+    """
+
+    # Arrange
+    hooks = MagicMock()
+    job_apps = [Dash(__name__, server=Flask(__name__)) for _ in range(2)]
+
+    # Act
+    with patch("dash_cognito_auth.cognito_oauth.hooks", hooks), patch(
+        "dash_cognito_auth.cognito_oauth._user_hook_registered", False
+    ):
+        CognitoOAuth(app, domain="test", region="eu-central-1")
+        calls_without_jobs = hooks.custom_data.call_count
+        for job_app in job_apps:
+            CognitoOAuth(
+                job_app, domain="test", region="eu-central-1", background_job_ttl=60
+            )
+
+    # Assert
+    assert calls_without_jobs == 0
+    hooks.custom_data.assert_called_once_with("cognito_user")
+
+
+def test_that_current_user_reads_the_job_context():
+    """
+    Without a request, the user comes from the context of the background job.
+    """
+
+    # Arrange
+    user = {"email": "user@example.com"}
+    token = context_value.set(AttributeDict(custom_data={"cognito_user": user}))
+
+    # Act
+    try:
+        result = current_user()
+    finally:
+        context_value.reset(token)
+
+    # Assert
+    assert result == user
@@ -0,0 +1,271 @@
+"""
+Test the bearer token mode for programmatic clients.
+"""
+
+# pylint: disable=W0212,W0621
+import time
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import pytest
+
+from dash import Dash
+from flask import Flask, g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cognito_oauth import INVALID_TOKEN_CACHE_TTL
+from dash_cognito_auth.tokens import decode_jwt
+
+
+@pytest.fixture
+def bearer_app(app: Dash, user_info) -> CognitoOAuth:
+    """
+    App that accepts bearer tokens with a /whoami endpoint returning the user
+    and a stubbed Cognito user info endpoint that rejects the tokens of the user
+    "revoked".
+    """
+
+    @app.server.route("/whoami")
+    def whoami():
+        return g.cognito_user
+
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        allow_bearer_tokens=True,
+        user_info_to_session_attr_mapping={"sub": "user_id"},
+    )
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+
+    def get(url, headers, timeout):  # pylint: disable=W0613
+        _, claims = decode_jwt(headers["Authorization"].removeprefix("Bearer "))
+        if claims["sub"] == "revoked":
+            return user_info(HTTPStatus.UNAUTHORIZED)
+        return user_info(sub=claims["sub"])
+
+    auth.http_session.get = MagicMock(side_effect=get)
+    return auth
+
+
+def test_that_a_valid_bearer_token_is_accepted(bearer_app: CognitoOAuth, access_token):
+    """
+    A valid token gives access to protected endpoints without creating a session.
+    """
+
+    # Arrange
+    client = bearer_app.app.server.test_client()
+    headers = {"Authorization": f"Bearer {access_token()}"}
+
+    # Act
+    response = client.get("/whoami", headers=headers)
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == {"user_id": "1234"}
+    assert "Set-Cookie" not in response.headers
+    assert bearer_app.http_session.get.call_args.args == (
+        "https://test.auth.eu-central-1.amazoncognito.com/oauth2/userInfo",
+    )
+
+
+def test_that_an_invalid_bearer_token_is_rejected_without_redirect(
+    bearer_app: CognitoOAuth, access_token
+):
+    """
+    Invalid tokens result in a 401, even for the index that would usually redirect.
+    """
+
+    # Arrange
+    client = bearer_app.app.server.test_client()
+    headers = {"Authorization": f"Bearer {access_token(sub='revoked')}"}
+
+    # Act
+    index_response = client.get("/", headers=headers)
+    whoami_response = client.get("/whoami", headers=headers)
+
+    # Assert
+    assert index_response.status_code == HTTPStatus.UNAUTHORIZED
+    assert whoami_response.status_code == HTTPStatus.UNAUTHORIZED
+    assert "Bearer" in whoami_response.headers["WWW-Authenticate"]
+
+
+def test_that_bearer_token_validation_is_cached(bearer_app: CognitoOAuth, access_token):
+    """
+    Repeated requests with the same token only call Cognito once.
+    """
+
+    # Arrange
+    flask_server: Flask = bearer_app.app.server
+    client = flask_server.test_client()
+    valid = {"Authorization": f"Bearer {access_token()}"}
+    revoked = {"Authorization": f"Bearer {access_token(sub='revoked')}"}
+
+    # Act
+    for _ in range(3):
+        client.get("/whoami", headers=valid)
+        client.get("/whoami", headers=revoked)
+
+    # Assert
+    assert bearer_app.http_session.get.call_count == 2
+
+
+def test_that_bearer_tokens_are_ignored_unless_enabled(app_with_auth: CognitoOAuth):
+    """
+    Without allow_bearer_tokens, the header has no effect on the browser flow.
+    """
+
+    # Arrange
+    client = app_with_auth.app.server.test_client()
+
+    # Act
+    response = client.get("/", headers={"Authorization": "Bearer valid"})
+
+    # Assert
+    assert response.status_code == HTTPStatus.FOUND
+
+
+@pytest.mark.parametrize(
+    "status, cached",
+    [
+        (HTTPStatus.UNAUTHORIZED, True),
+        (HTTPStatus.TOO_MANY_REQUESTS, False),
+        (HTTPStatus.BAD_GATEWAY, False),
+    ],
+)
+def test_that_only_invalid_tokens_are_cached_as_rejected(
+    bearer_app: CognitoOAuth,
+    access_token,
+    user_info,
+    status: HTTPStatus,
+    cached: bool,
+):
+    """
+    Throttling and errors of Cognito don't lock out clients with valid tokens,
+    and rejected tokens are cached for a shorter time than valid ones.
+    """
+
+    # Arrange
+    bearer_app.http_session.get = MagicMock(return_value=user_info(status))
+    client = bearer_app.app.server.test_client()
+
+    # Act
+    rejected = client.get(
+        "/whoami", headers={"Authorization": f"Bearer {access_token()}"}
+    )
+
+    # Assert
+    assert rejected.status_code == HTTPStatus.UNAUTHORIZED
+    assert len(bearer_app.bearer_token_cache) == (1 if cached else 0)
+    if cached:
+        entry = next(iter(bearer_app.bearer_token_cache._data.values()))
+        assert entry.expires_at - time.monotonic() <= INVALID_TOKEN_CACHE_TTL
+
+
+def test_that_tokens_without_a_mapped_attribute_are_rejected(
+    bearer_app: CognitoOAuth, access_token, user_info
+):
+    """
+    A token whose scope doesn't cover a mapped attribute gets a 401, not a 500.
+    """
+
+    # Arrange
+    bearer_app.http_session.get = MagicMock(
+        return_value=user_info(email="user@example.com")
+    )
+    client = bearer_app.app.server.test_client()
+
+    # Act
+    rejected = client.get(
+        "/whoami", headers={"Authorization": f"Bearer {access_token()}"}
+    )
+
+    # Assert
+    assert rejected.status_code == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"client_id": "anotherclient"},
+        {"token_use": "id"},
+        {"exp": 1700000000},
+    ],
+)
+def test_that_tokens_for_other_clients_are_rejected_without_cognito(
+    bearer_app: CognitoOAuth, access_token, claims: dict
+):
+    """
+    Tokens of other app clients of the pool, id tokens and expired tokens aren't
+    accepted, even though the user info endpoint would accept some of them.
+    """
+
+    # Arrange
+    client = bearer_app.app.server.test_client()
+    headers = {"Authorization": f"Bearer {access_token(**claims)}"}
+
+    # Act
+    response = client.get("/whoami", headers=headers)
+
+    # Assert
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    bearer_app.http_session.get.assert_not_called()
+
+
+def test_that_the_signature_is_verified_with_the_jwks_of_the_pool(
+    app: Dash, access_token, jwks: dict, user_info
+):
+    """
+    Once the JWKS of the user pool is loaded, tokens that aren't signed with one
+    of its keys are rejected.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        allow_bearer_tokens=True,
+        user_pool_id="eu-central-1_AbCdEf",
+    )
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    auth.metadata.discovery = {"issuer": auth.metadata.issuer}
+    auth.metadata.jwks = jwks
+    auth.http_session.get = MagicMock(return_value=user_info(email="user@example.com"))
+    header, _, signature = access_token().split(".")
+    forged = ".".join([header, access_token(sub="admin").split(".")[1], signature])
+    client = auth.app.server.test_client()
+
+    # Act
+    accepted = client.get(
+        "/whoami", headers={"Authorization": f"Bearer {access_token()}"}
+    )
+    rejected = client.get("/whoami", headers={"Authorization": f"Bearer {forged}"})
+
+    # Assert
+    assert accepted.status_code == HTTPStatus.OK
+    assert rejected.status_code == HTTPStatus.UNAUTHORIZED
+    assert auth.http_session.get.call_count == 1
+
+
+def test_that_a_user_info_response_that_isnt_json_is_not_a_500(
+    bearer_app: CognitoOAuth, access_token, user_info
+):
+    """
+    A broken answer of Cognito rejects the request without caching the result.
+    """
+
+    # Arrange
+    response = user_info()
+    response.json.side_effect = ValueError("Expecting value")
+    bearer_app.http_session.get = MagicMock(return_value=response)
+    client = bearer_app.app.server.test_client()
+
+    # Act
+    rejected = client.get(
+        "/whoami", headers={"Authorization": f"Bearer {access_token()}"}
+    )
+
+    # Assert
+    assert rejected.status_code == HTTPStatus.UNAUTHORIZED
+    assert len(bearer_app.bearer_token_cache) == 0
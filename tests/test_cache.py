@@ -0,0 +1,98 @@
+"""
+Test the memory accounting of the in-process caches.
+"""
+
+from dash import Dash
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cache import DEFAULT_MAXSIZE, TTLCache
+
+
+def test_that_the_cache_is_bounded_by_bytes():
+    """
+    The least recently used entries are evicted once maxbytes is exceeded.
+    """
+
+    # Arrange
+    cache = TTLCache(maxsize=1000, maxbytes=2000)
+
+    # Act
+    for number in range(100):
+        cache.set(f"key-{number}", ("user@example.com",))
+
+    # Assert
+    assert 0 < cache.bytes <= 2000
+    assert len(cache) < 100
+    assert cache.get("key-99") == ("user@example.com",)
+    assert cache.get("key-0") is None
+
+
+def test_that_a_byte_bound_replaces_the_entry_bound(app: Dash):
+    """
+    With cache_max_bytes the caches keep more than the default number of entries.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        background_job_ttl=60,
+        cache_max_bytes=10**9,
+    )
+
+    # Act
+    for number in range(DEFAULT_MAXSIZE + 1000):
+        auth.bearer_token_cache.set(f"token-{number}", ("user@example.com",))
+        auth.job_owners.set(f"job-{number}", (None, ("user@example.com",)))
+
+    # Assert
+    assert len(auth.bearer_token_cache) == DEFAULT_MAXSIZE + 1000
+    assert len(auth.job_owners) == DEFAULT_MAXSIZE + 1000
+    assert TTLCache().maxsize == DEFAULT_MAXSIZE
+
+
+def test_that_bytes_are_released_with_the_entries():
+    """
+    Replacing, popping and clearing entries keep the byte count right.
+    """
+
+    # Arrange
+    cache = TTLCache()
+    cache.set("a", "x" * 100)
+    size = cache.bytes
+
+    # Act
+    cache.set("a", "x" * 100)
+    replaced = cache.bytes
+    cache.pop("a")
+    popped = cache.bytes
+    cache.set("b", "y")
+    cache.clear()
+
+    # Assert
+    assert replaced == size
+    assert popped == 0
+    assert cache.bytes == 0
+
+
+def test_that_cached_users_are_stored_without_attribute_names(app: Dash):
+    """
+    Users are cached as tuples of their values and restored as dicts.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        user_info_to_session_attr_mapping={"sub": "user_id", "email": "email"},
+    )
+    user = {"user_id": "1234", "email": "user@example.com"}
+
+    # Act
+    packed = auth.pack_user(user)
+
+    # Assert
+    assert packed == ("1234", "user@example.com")
+    assert auth.unpack_user(packed) == user
@@ -0,0 +1,168 @@
+"""
+Stress tests that drive many threads through the wrapped views at once.
+
+Cognito is replaced by a stub transport adapter, so the requests go through the
+real cognito LocalProxy, the Flask-Dance OAuth session and the session writes
+in is_authorized.
+"""
+
+# pylint: disable=W0621
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from dash import Dash, html
+from flask import g, session
+from requests.adapters import BaseAdapter
+
+from dash_cognito_auth import CognitoOAuth
+
+REQUESTS_PER_USER = 20
+
+
+class StubCognito(BaseAdapter):
+    """
+    Transport adapter answering the user info endpoint for tokens "token-<n>".
+    """
+
+    def __init__(self, latency: float = 0.001):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):  # pylint: disable=W0221
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        user_number = token.removeprefix("token-")
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(  # pylint: disable=W0212
+            {"sub": user_number, "email": f"user-{user_number}@example.com"}
+        ).encode("utf-8")
+        return response
+
+    def close(self):
+        pass
+
+
+def make_app(**kwargs) -> tuple[CognitoOAuth, StubCognito]:
+    """
+    App with a protected /whoami endpoint wired to a stub Cognito.
+    """
+
+    dash_app = Dash("stress", url_base_pathname="/")
+    dash_app.layout = html.H1("Hello World")
+    dash_app.server.secret_key = "just_a_test"
+
+    @dash_app.server.route("/whoami")
+    def whoami():
+        return {"user": g.cognito_user["user_id"], "session": session.get("user_id")}
+
+    auth = CognitoOAuth(
+        dash_app,
+        domain="test",
+        region="eu-central-1",
+        user_info_to_session_attr_mapping={"sub": "user_id"},
+        **kwargs,
+    )
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_SECRET"] = "testsecret"
+
+    stub = StubCognito()
+    auth.http_session.mount("https://", stub)
+    return auth, stub
+
+
+def run_user(auth: CognitoOAuth, user_number: int) -> list[str]:
+    """
+    Log in as the given user and call /whoami repeatedly, returning the problems.
+    """
+
+    client = auth.app.server.test_client()
+    with client.session_transaction() as sess:
+        sess["cognito_oauth_token"] = {
+            "access_token": f"token-{user_number}",
+            "token_type": "Bearer",
+            "expires_at": time.time() + 3600,
+        }
+
+    problems = []
+    for _ in range(REQUESTS_PER_USER):
+        response = client.get("/whoami")
+        if response.status_code != 200:
+            problems.append(f"user {user_number}: status {response.status_code}")
+        elif response.json["user"] != str(user_number):
+            problems.append(f"user {user_number}: got {response.json['user']}")
+
+    with client.session_transaction() as sess:
+        if sess.get("user_id") != str(user_number):
+            problems.append(f"user {user_number}: session has {sess.get('user_id')}")
+
+    return problems
+
+
+def run_users(auth: CognitoOAuth, threads: int) -> tuple[list[str], float]:
+    """
+    Run one user per thread, returning all problems and the requests per second.
+    """
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda n: run_user(auth, n), range(threads)))
+    elapsed = time.perf_counter() - start
+
+    problems = [problem for result in results for problem in result]
+    return problems, threads * REQUESTS_PER_USER / elapsed
+
+
+@pytest.mark.parametrize("threads", [1, 4, 16])
+def test_that_concurrent_users_never_see_each_others_identity(
+    threads: int, record_property
+):
+    """
+    Every request sees its own user, in g.cognito_user and in the session.
+    """
+
+    # Arrange
+    auth, stub = make_app()
+
+    # Act
+    problems, throughput = run_users(auth, threads)
+    record_property("requests_per_second", round(throughput))
+
+    # Assert
+    assert not problems
+    assert stub.calls == threads * REQUESTS_PER_USER
+
+
+@pytest.mark.parametrize("threads", [1, 4, 16])
+def test_that_concurrent_users_with_tickets_keep_their_identity(
+    threads: int, record_property
+):
+    """
+    With tickets, only the first request of every user reaches Cognito and the
+    identities still don't mix.
+    """
+
+    # Arrange
+    auth, stub = make_app(ticket_ttl=60)
+
+    # Act
+    problems, throughput = run_users(auth, threads)
+    record_property("requests_per_second", round(throughput))
+
+    # Assert
+    assert not problems
+    assert stub.calls == threads
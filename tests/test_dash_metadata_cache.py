@@ -0,0 +1,128 @@
+"""
+Test the private HTTP caching of _dash-layout and _dash-dependencies.
+"""
+
+# pylint: disable=W0621
+from http import HTTPStatus
+
+import pytest
+
+from dash import Dash, html
+
+from dash_cognito_auth import CognitoOAuth
+
+
+@pytest.fixture
+def authorized_app_options() -> dict:
+    return {"cache_dash_metadata": True}
+
+
+def test_that_layout_and_dependencies_are_revalidated_privately(
+    authorized_app: CognitoOAuth,
+):
+    """
+    Both endpoints send an ETag and private caching headers and answer with a
+    304 when the browser's copy is current.
+    """
+
+    # Arrange
+    client = authorized_app.app.server.test_client()
+
+    for path in ["/_dash-layout", "/_dash-dependencies"]:
+        # Act
+        response = client.get(path)
+        not_modified = client.get(
+            path, headers={"If-None-Match": response.headers["ETag"]}
+        )
+
+        # Assert
+        assert response.status_code == HTTPStatus.OK
+        assert "private" in response.headers["Cache-Control"]
+        assert "no-cache" in response.headers["Cache-Control"]
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+        assert not_modified.get_data() == b""
+
+
+def test_that_a_new_layout_changes_the_etag(authorized_app: CognitoOAuth):
+    """
+    Replacing the layout invalidates the cached _dash-layout response.
+    """
+
+    # Arrange
+    app = authorized_app.app
+    client = app.server.test_client()
+    etag = client.get("/_dash-layout").headers["ETag"]
+
+    # Act
+    app.layout = html.H1("Something else")
+    response = client.get("/_dash-layout", headers={"If-None-Match": etag})
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert b"Something else" in response.get_data()
+
+
+def test_that_a_layout_changed_in_place_changes_the_etag(
+    authorized_app: CognitoOAuth,
+):
+    """
+    Changes to the children of the layout aren't hidden by the cache.
+    """
+
+    # Arrange
+    app = authorized_app.app
+    app.layout = html.Div([html.H1("Hello World")])
+    client = app.server.test_client()
+    etag = client.get("/_dash-layout").headers["ETag"]
+
+    # Act
+    app.layout.children.append(html.P("Appended"))
+    response = client.get("/_dash-layout", headers={"If-None-Match": etag})
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+    assert b"Appended" in response.get_data()
+
+
+def test_that_layout_functions_are_rendered_per_request(authorized_app: CognitoOAuth):
+    """
+    Layout functions may differ per user, so they're never served from the cache.
+    """
+
+    # Arrange
+    calls = []
+
+    def layout():
+        calls.append(1)
+        return html.H1(f"Call {len(calls)}")
+
+    app = authorized_app.app
+    app.layout = layout
+    client = app.server.test_client()
+
+    # Act
+    first = client.get("/_dash-layout")
+    second = client.get("/_dash-layout")
+
+    # Assert
+    assert first.get_data() != second.get_data()
+    assert "private" in second.headers["Cache-Control"]
+
+
+def test_that_metadata_endpoints_still_require_authorization(app: Dash):
+    """
+    Without authorization, the endpoints still answer with a 403.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app, domain="test", region="eu-central-1", cache_dash_metadata=True
+    )
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.get("/_dash-layout")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
@@ -0,0 +1,146 @@
+"""
+Test the warm-up with the OpenID Connect discovery metadata.
+"""
+
+# pylint: disable=W0621
+import os
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.discovery import CognitoMetadata
+
+ISSUER = "https://cognito-idp.eu-central-1.amazonaws.com/eu-central-1_AbCdEf"
+DISCOVERY = {"issuer": ISSUER, "jwks_uri": f"{ISSUER}/.well-known/jwks.json"}
+JWKS = {"keys": [{"kid": "1", "kty": "RSA"}]}
+
+
+@pytest.fixture
+def http_session() -> MagicMock:
+    """
+    HTTP session stub that serves the discovery document and JWKS.
+    """
+
+    def get(url, timeout):  # pylint: disable=W0613
+        response = MagicMock()
+        response.json.return_value = DISCOVERY if "openid" in url else JWKS
+        return response
+
+    return MagicMock(get=MagicMock(side_effect=get))
+
+
+def test_that_metadata_is_fetched_and_cached(tmp_path, http_session):
+    """
+    Fetched metadata is written to the cache file and picked up from there on
+    the next start without calling Cognito.
+    """
+
+    # Arrange
+    cache_path = str(tmp_path / "cognito.json")
+    metadata = CognitoMetadata("eu-central-1_AbCdEf", cache_path=cache_path)
+
+    # Act
+    metadata.load(http_session)
+    restarted = CognitoMetadata("eu-central-1_AbCdEf", cache_path=cache_path)
+    restarted.load(MagicMock(get=MagicMock(side_effect=AssertionError)))
+
+    # Assert
+    assert http_session.get.call_args_list[0].args == (
+        f"{ISSUER}/.well-known/openid-configuration",
+    )
+    assert metadata.loaded
+    assert restarted.discovery == DISCOVERY
+    assert restarted.jwks == JWKS
+
+
+def test_that_failing_to_fetch_metadata_is_not_fatal(tmp_path):
+    """
+    If Cognito can't be reached and there's no cache, the metadata isn't loaded.
+    """
+
+    # Arrange
+    metadata = CognitoMetadata(
+        "eu-central-1_AbCdEf", cache_path=str(tmp_path / "cognito.json")
+    )
+    http_session = MagicMock(
+        get=MagicMock(side_effect=requests.ConnectionError("unreachable"))
+    )
+
+    # Act
+    loaded = metadata.load(http_session)
+
+    # Assert
+    assert not loaded
+    assert not metadata.loaded
+
+
+def test_that_warm_up_opens_a_connection_to_cognito(app, tmp_path, monkeypatch):
+    """
+    The warm-up loads the metadata and connects to the Cognito domain.
+    """
+
+    # Arrange
+    cache_path = tmp_path / "cognito.json"
+    head = MagicMock()
+    monkeypatch.setattr(requests.Session, "head", head)
+    monkeypatch.setattr(
+        CognitoMetadata,
+        "fetch",
+        lambda self, *args, **kwargs: setattr(self, "discovery", DISCOVERY)
+        or setattr(self, "jwks", JWKS),
+    )
+
+    # Act
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        user_pool_id="eu-central-1_AbCdEf",
+        warm_up=True,
+        metadata_cache_path=str(cache_path),
+    )
+
+    # Assert
+    assert auth.metadata.loaded
+    assert head.call_args.args == ("https://test.auth.eu-central-1.amazoncognito.com",)
+
+
+def test_that_a_forked_worker_warms_up_on_its_first_request(app, monkeypatch):
+    """
+    A process forked after the warm-up doesn't reuse the parent's connection, it
+    opens its own on its first request and keeps the loaded metadata.
+    """
+
+    # Arrange
+    head = MagicMock()
+    close = MagicMock()
+    fetch = MagicMock()
+    monkeypatch.setattr(requests.Session, "head", head)
+    monkeypatch.setattr(requests.Session, "close", close)
+    monkeypatch.setattr(CognitoMetadata, "fetch", fetch)
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        user_pool_id="eu-central-1_AbCdEf",
+        warm_up=True,
+    )
+    auth.metadata.discovery, auth.metadata.jwks = DISCOVERY, JWKS
+    client = auth.app.server.test_client()
+    client.get("/")
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+
+    # Act
+    client.get("/")
+    client.get("/")
+    for thread in threading.enumerate():
+        if thread.name == "cognito-warm-up":
+            thread.join()
+
+    # Assert
+    close.assert_called_once_with()
+    assert head.call_count == 2
+    assert fetch.call_count == 1
@@ -0,0 +1,105 @@
+"""
+Test the health and readiness endpoints.
+"""
+
+import time
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+import requests
+from dash import Dash
+
+from dash_cognito_auth import CognitoOAuth, discovery
+
+
+def test_that_health_endpoint_is_unauthenticated_and_sessionless(app: Dash):
+    """
+    The health endpoint answers without authentication and without a cookie.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(app, domain="test", region="eu-central-1", health_url="healthz")
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.get("/healthz")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == {"status": "ok"}
+    assert "Set-Cookie" not in response.headers
+    assert "Cookie" not in response.headers.get("Vary", "")
+
+
+def test_that_readiness_respects_the_path_prefix(app_with_url_prefix: Dash):
+    """
+    The readiness endpoint is added below the path prefix of the Dash app.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app_with_url_prefix,
+        domain="test",
+        region="eu-central-1",
+        readiness_url="/readyz",
+        max_upstream_calls=4,
+    )
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.get("/some/prefix/readyz")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json["ready"] is True
+    assert response.json["metadata"] == {"configured": False, "loaded": False}
+    assert response.json["upstream"]["max_concurrent"] == 4
+    assert response.json["caches"]["bearer_tokens"]["size"] == 0
+
+
+def test_that_readiness_loads_the_metadata_until_it_succeeds(app: Dash, monkeypatch):
+    """
+    With a user pool configured, the app isn't ready before its metadata is
+    loaded. Failed loads are retried by the probes once the backoff elapsed.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        user_pool_id="eu-central-1_AbCdEf",
+        readiness_url="readyz",
+    )
+    issuer = auth.metadata.issuer
+    responses = {
+        f"{issuer}/.well-known/openid-configuration": {
+            "issuer": issuer,
+            "jwks_uri": f"{issuer}/.well-known/jwks.json",
+        },
+        f"{issuer}/.well-known/jwks.json": {"keys": []},
+    }
+    get = MagicMock(
+        side_effect=[requests.ConnectionError("unreachable")]
+        + [MagicMock(json=MagicMock(return_value=body)) for body in responses.values()]
+    )
+    monkeypatch.setattr(auth.http_session, "get", get)
+    now = time.monotonic()
+    monkeypatch.setattr(discovery.time, "monotonic", lambda: now)
+    client = auth.app.server.test_client()
+
+    # Act
+    failed_response = client.get("/readyz")
+    backoff_response = client.get("/readyz")
+    now += discovery.MIN_RETRY_DELAY
+    ready_response = client.get("/readyz")
+
+    # Assert
+    assert failed_response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert backoff_response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert ready_response.status_code == HTTPStatus.OK
+    assert ready_response.json["metadata"] == {"configured": True, "loaded": True}
+    assert [call.args[0] for call in get.call_args_list] == [
+        f"{issuer}/.well-known/openid-configuration",
+        *responses,
+    ]
@@ -0,0 +1,127 @@
+"""
+Test the cached Dash index page.
+"""
+
+# pylint: disable=W0621
+import json
+import re
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+
+from dash import Dash
+from flask import Response
+
+from dash_cognito_auth import CognitoOAuth
+
+
+@pytest.fixture
+def authorized_app_options() -> dict:
+    return {"cache_index": True}
+
+
+def dash_config(response) -> dict:
+    match = re.search(
+        r'<script id="_dash-config" type="application/json">(.*?)</script>',
+        response.get_data(as_text=True),
+        re.DOTALL,
+    )
+    return json.loads(match.group(1))
+
+
+def test_that_the_index_is_rendered_once_with_a_config_per_page_load(
+    authorized_app: CognitoOAuth,
+):
+    """
+    The index is only rendered again after the app changed, but every page load
+    gets its own end_id for the background callbacks.
+    """
+
+    # Arrange
+    app = authorized_app.app
+    client = app.server.test_client()
+
+    with patch.object(Dash, "index", autospec=True, side_effect=Dash.index) as index:
+        # Act
+        first = client.get("/")
+        second = client.get("/")
+        app.title = "Changed"
+        changed = client.get("/")
+
+    # Assert
+    assert first.status_code == HTTPStatus.OK
+    assert dash_config(first)["end_id"] != dash_config(second)["end_id"]
+    assert (
+        first.get_data().replace(
+            dash_config(first)["end_id"].encode(),
+            dash_config(second)["end_id"].encode(),
+        )
+        == second.get_data()
+    )
+    assert "private" in first.headers["Cache-Control"]
+    assert "ETag" not in first.headers
+    assert b"Changed" in changed.get_data()
+    assert index.call_count == 2
+
+
+def test_that_a_config_without_end_id_is_served_with_an_etag(
+    authorized_app: CognitoOAuth,
+):
+    """
+    Without a per page load end_id, the whole index is cached and a matching
+    If-None-Match results in a 304.
+    """
+
+    # Arrange
+    client = authorized_app.app.server.test_client()
+
+    with patch.object(
+        Dash,
+        "_generate_config_html",
+        return_value='<script id="_dash-config" type="application/json">{}</script>',
+    ):
+        # Act
+        first = client.get("/")
+        second = client.get("/")
+        not_modified = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+
+    # Assert
+    assert second.get_data() == first.get_data()
+    assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_that_failed_renders_are_not_cached(authorized_app: CognitoOAuth):
+    """
+    An error while rendering the index isn't served to later requests.
+    """
+
+    # Arrange
+    renders = [Response("Unavailable", status=503), Response("Index")]
+    client = authorized_app.app.server.test_client()
+
+    with patch.object(Dash, "index", side_effect=renders):
+        # Act
+        failed = client.get("/")
+        recovered = client.get("/")
+
+    # Assert
+    assert failed.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert recovered.status_code == HTTPStatus.OK
+    assert recovered.get_data() == b"Index"
+
+
+def test_that_the_cached_index_still_requires_authorization(app: Dash):
+    """
+    Anonymous users are redirected to the login even if the index is cached.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(app, domain="test", region="eu-central-1", cache_index=True)
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.get("/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FOUND
@@ -0,0 +1,144 @@
+"""
+Test the WSGI middleware that rejects anonymous requests before Flask dispatch.
+"""
+
+# pylint: disable=W0621
+from http import HTTPStatus
+
+import pytest
+
+from dash import Dash
+from flask import g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cognito_oauth import TICKET_COOKIE_NAME
+from dash_cognito_auth.middleware import CognitoAuthMiddleware
+
+
+@pytest.fixture
+def protected_app(app: Dash) -> tuple[CognitoOAuth, list]:
+    """
+    App behind the middleware with a /whoami endpoint and a list that records
+    every request Flask dispatched.
+    """
+
+    dispatched = []
+
+    @app.server.route("/whoami")
+    def whoami():
+        return g.cognito_user
+
+    auth = CognitoOAuth(
+        app, domain="test", region="eu-central-1", ticket_ttl=60, health_url="healthz"
+    )
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    auth.app.server.config["COGNITO_OAUTH_CLIENT_SECRET"] = "testsecret"
+    auth.app.server.before_request(lambda: dispatched.append(1) and None)
+    auth.app.server.wsgi_app = CognitoAuthMiddleware(auth)
+    return auth, dispatched
+
+
+def test_that_anonymous_requests_never_reach_flask(protected_app):
+    """
+    Anonymous requests to the index are redirected to the login, all others get
+    a 403, without Flask dispatching them or setting a cookie.
+    """
+
+    # Arrange
+    auth, dispatched = protected_app
+    client = auth.app.server.test_client()
+
+    # Act
+    index_response = client.get("/")
+    whoami_response = client.get("/whoami")
+
+    # Assert
+    assert index_response.status_code == HTTPStatus.FOUND
+    assert index_response.headers["Location"] == "/login/cognito"
+    assert whoami_response.status_code == HTTPStatus.FORBIDDEN
+    assert "Set-Cookie" not in whoami_response.headers
+    assert not dispatched
+
+
+def test_that_public_endpoints_pass_the_middleware(protected_app):
+    """
+    The login and probe endpoints can be reached without credentials.
+    """
+
+    # Arrange
+    auth, dispatched = protected_app
+    client = auth.app.server.test_client()
+
+    # Act
+    login_response = client.get("/login/cognito")
+    health_response = client.get("/healthz")
+
+    # Assert
+    assert login_response.headers["Location"].startswith("https://test.auth.")
+    assert health_response.status_code == HTTPStatus.OK
+    assert len(dispatched) == 2
+
+
+def test_that_a_valid_ticket_passes_the_identity_on(protected_app, stub_cognito):
+    """
+    The user of a valid ticket is handed to the app, which doesn't check again.
+    """
+
+    # Arrange
+    auth, _ = protected_app
+    client = auth.app.server.test_client()
+    ticket = auth.ticket_serializer().dumps(
+        {"sub": "1234", "user": {"email": "user@example.com"}}
+    )
+    client.set_cookie(TICKET_COOKIE_NAME, ticket)
+
+    # Act
+    response = client.get("/whoami")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == {"email": "user@example.com"}
+    stub_cognito.get.assert_not_called()
+
+
+def test_that_sessions_with_a_token_are_checked_by_the_app(
+    protected_app, stub_cognito, user_info
+):
+    """
+    A session holding an OAuth token is passed on to the full check in the app.
+    """
+
+    # Arrange
+    auth, dispatched = protected_app
+    client = auth.app.server.test_client()
+    with client.session_transaction() as sess:
+        sess["cognito_oauth_token"] = {"access_token": "a", "token_type": "Bearer"}
+
+    stub_cognito.get.return_value = user_info(HTTPStatus.UNAUTHORIZED)
+
+    # Act
+    response = client.get("/whoami")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert len(dispatched) == 1
+    stub_cognito.get.assert_called_once()
+
+
+def test_that_an_injected_identity_is_ignored(protected_app):
+    """
+    An identity in the environ that wasn't set by the middleware isn't trusted.
+    """
+
+    # Arrange
+    auth, dispatched = protected_app
+    client = auth.app.server.test_client()
+
+    # Act
+    response = client.get(
+        "/whoami", environ_base={"dash_cognito_auth.user": {"email": "x"}}
+    )
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert not dispatched
@@ -0,0 +1,141 @@
+"""
+Test the per-user rate limiting of protected endpoints.
+"""
+
+from http import HTTPStatus
+from unittest.mock import MagicMock, patch
+
+from dash import Dash
+from flask import g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.ratelimit import (
+    REDIS_ERRORS,
+    MemoryBucketStore,
+    RateLimiter,
+    RedisBucketStore,
+)
+
+
+def test_that_the_bucket_refills_over_time():
+    """
+    After the burst is used up, tokens become available again at the given rate.
+    """
+
+    # Arrange
+    store = MemoryBucketStore()
+
+    with patch("dash_cognito_auth.ratelimit.time.monotonic", return_value=100):
+        # Act
+        burst = [store.take("user", rate=2, burst=3) for _ in range(4)]
+
+    with patch("dash_cognito_auth.ratelimit.time.monotonic", return_value=100.5):
+        refilled = store.take("user", rate=2, burst=3)
+
+    # Assert
+    assert burst == [0, 0, 0, 0.5]
+    assert refilled == 0
+
+
+def test_that_routes_can_have_their_own_limits():
+    """
+    Routes with their own limits use a separate bucket, None exempts a route.
+    """
+
+    # Arrange
+    limiter = RateLimiter(
+        rate=1,
+        burst=1,
+        routes={"/_dash-update-component": (1, 2), "/_dash-layout": None},
+    )
+    user = {"email": "user@example.com"}
+
+    # Act
+    default_route = [limiter.check(user, "/whoami") for _ in range(2)]
+    callbacks = [limiter.check(user, "/_dash-update-component") for _ in range(3)]
+    layout = [limiter.check(user, "/_dash-layout") for _ in range(3)]
+
+    # Assert
+    assert default_route[0] == 0 and default_route[1] > 0
+    assert callbacks[:2] == [0, 0] and callbacks[2] > 0
+    assert layout == [0, 0, 0]
+
+
+def test_that_users_over_the_limit_get_a_429(app: Dash):
+    """
+    Once a user exhausts the bucket, the wrapped view isn't called anymore.
+    """
+
+    # Arrange
+    calls = []
+
+    @app.server.route("/whoami")
+    def whoami():
+        calls.append(g.cognito_user)
+        return g.cognito_user
+
+    def is_authorized_call(_):
+        g.cognito_user = {"email": "user@example.com"}
+        return True
+
+    with patch(
+        "dash_cognito_auth.cognito_oauth.CognitoOAuth.is_authorized", is_authorized_call
+    ):
+        auth = CognitoOAuth(
+            app,
+            domain="test",
+            region="eu-central-1",
+            rate_limiter=RateLimiter(rate=0.1, burst=2),
+        )
+        client = auth.app.server.test_client()
+
+        # Act
+        responses = [client.get("/whoami") for _ in range(3)]
+
+    # Assert
+    assert [response.status_code for response in responses] == [
+        HTTPStatus.OK,
+        HTTPStatus.OK,
+        HTTPStatus.TOO_MANY_REQUESTS,
+    ]
+    assert responses[2].headers["Retry-After"] == "10"
+    assert len(calls) == 2
+
+
+def test_that_the_redis_store_runs_the_script_with_the_prefixed_key():
+    """
+    Every check is one call of the registered script, returning its result.
+    """
+
+    # Arrange
+    script = MagicMock(return_value=b"0.5")
+    client = MagicMock(register_script=MagicMock(return_value=script))
+    store = RedisBucketStore(client, prefix="test:")
+
+    # Act
+    retry_after = store.take("user", rate=2, burst=3)
+
+    # Assert
+    assert retry_after == 0.5
+    client.register_script.assert_called_once_with(RedisBucketStore.SCRIPT)
+    script.assert_called_once_with(keys=["test:user"], args=[2, 3])
+
+
+def test_that_requests_are_let_through_while_redis_is_unavailable():
+    """
+    Connection errors and timeouts of Redis don't fail the request.
+    """
+
+    # Arrange
+    script = MagicMock(side_effect=[error("unavailable") for error in REDIS_ERRORS])
+    client = MagicMock(register_script=MagicMock(return_value=script))
+    limiter = RateLimiter(
+        rate=1, burst=1, key="user_id", store=RedisBucketStore(client)
+    )
+
+    # Act
+    results = [limiter.check({"user_id": "1234"}, "/") for _ in REDIS_ERRORS]
+
+    # Assert
+    assert results == [0] * len(REDIS_ERRORS)
+    assert limiter.limited == 0
@@ -0,0 +1,99 @@
+"""
+Test the compact session encoding.
+"""
+
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.session import CompactSessionInterface
+
+TOKEN = {
+    "access_token": "a" * 1000,
+    "refresh_token": "r" * 1700,
+    "id_token": "i" * 1100,
+    "expires_in": 3600,
+    "expires_at": 1700000000.0,
+    "token_type": "Bearer",
+}
+
+
+def _cookie_for(server: Flask, data: dict) -> str:
+    serializer = server.session_interface.get_signing_serializer(server)
+    return serializer.dumps(data)
+
+
+def _load_cookie(server: Flask, cookie: str) -> dict:
+    serializer = server.session_interface.get_signing_serializer(server)
+    return serializer.loads(cookie)
+
+
+def test_that_compact_session_can_be_enabled(app):
+    """
+    Passing compact_session=True replaces the session interface of the server.
+    """
+
+    # Act
+    CognitoOAuth(app, domain="test", region="eu-central-1", compact_session=True)
+
+    # Assert
+    assert isinstance(app.server.session_interface, CompactSessionInterface)
+
+
+def test_that_compact_session_drops_unused_token_fields(app):
+    """
+    The id_token and expires_in fields aren't stored, everything else round-trips.
+    """
+
+    # Arrange
+    CognitoOAuth(app, domain="test", region="eu-central-1", compact_session=True)
+    server: Flask = app.server
+
+    # Act
+    data = _load_cookie(
+        server, _cookie_for(server, {"cognito_oauth_token": TOKEN, "email": "a@b.c"})
+    )
+
+    # Assert
+    assert data["email"] == "a@b.c"
+    assert "id_token" not in data["cognito_oauth_token"]
+    assert "expires_in" not in data["cognito_oauth_token"]
+    assert data["cognito_oauth_token"]["access_token"] == TOKEN["access_token"]
+    assert data["cognito_oauth_token"]["expires_at"] == TOKEN["expires_at"]
+
+
+def test_that_compact_session_cookie_is_smaller(app):
+    """
+    The compact cookie should be noticeably smaller than the default one.
+    """
+
+    # Arrange
+    server: Flask = app.server
+    data = {"cognito_oauth_token": TOKEN, "email": "a@b.c"}
+    default_cookie = _cookie_for(server, data)
+
+    # Act
+    CognitoOAuth(app, domain="test", region="eu-central-1", compact_session=True)
+    compact_cookie = _cookie_for(server, data)
+
+    # Assert
+    assert len(compact_cookie) < len(default_cookie)
+
+
+def test_that_compact_session_accepts_default_cookies(app):
+    """
+    Sessions written before compact_session was enabled are still readable.
+    """
+
+    # Arrange
+    server: Flask = app.server
+    server.session_interface = SecureCookieSessionInterface()
+    default_cookie = _cookie_for(server, {"cognito_oauth_token": TOKEN})
+
+    # Act
+    CognitoOAuth(app, domain="test", region="eu-central-1", compact_session=True)
+    data = _load_cookie(server, default_cookie)
+
+    # Assert
+    assert data["cognito_oauth_token"] == TOKEN
+
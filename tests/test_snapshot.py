@@ -0,0 +1,236 @@
+"""
+Test the snapshots of the caches that survive a restart.
+"""
+
+import os
+import time
+from http import HTTPStatus
+from unittest.mock import MagicMock
+
+from dash import Dash, html
+from flask import Flask, g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cache import TTLCache
+from dash_cognito_auth.snapshot import CacheSnapshot
+
+
+def test_that_entries_are_restored_with_their_expiry(tmp_path):
+    """
+    Restored entries expire when they would have in the saving process.
+    """
+
+    # Arrange
+    cache = TTLCache(ttl=60)
+    cache.set("long", {"email": "user@example.com"})
+    cache.set("short", False, ttl=0.05)
+    snapshot = CacheSnapshot(str(tmp_path / "caches.snapshot"))
+    snapshot.save({"users": cache}, "secret")
+    time.sleep(0.1)
+
+    # Act
+    restored = TTLCache(ttl=60)
+    count = snapshot.load({"users": restored}, "secret")
+
+    # Assert
+    assert count == 1
+    assert restored.get("long") == {"email": "user@example.com"}
+    assert restored.get("short") is None
+    assert 59 < restored.snapshot()[0][1] - time.time() <= 60
+
+
+def test_that_a_snapshot_with_another_key_is_ignored(tmp_path):
+    """
+    Snapshots that weren't signed with the secret key aren't restored.
+    """
+
+    # Arrange
+    cache = TTLCache()
+    cache.set("token", {"email": "user@example.com"})
+    snapshot = CacheSnapshot(str(tmp_path / "caches.snapshot"))
+    snapshot.save({"users": cache}, "another secret")
+
+    # Act
+    restored = TTLCache()
+    count = snapshot.load({"users": restored}, "secret")
+
+    # Assert
+    assert count == 0
+    assert len(restored) == 0
+
+
+def test_that_a_missing_snapshot_is_ignored(tmp_path):
+    """
+    Without a snapshot file the caches stay empty.
+    """
+
+    # Arrange
+    snapshot = CacheSnapshot(str(tmp_path / "missing.snapshot"))
+
+    # Act
+    count = snapshot.load({"users": TTLCache()}, "secret")
+
+    # Assert
+    assert count == 0
+
+
+def make_app() -> Dash:
+    dash_app = Dash("dash", server=Flask("dash"), url_base_pathname="/")
+    dash_app.layout = html.H1("Hello World")
+    dash_app.server.secret_key = "just_a_test"
+
+    @dash_app.server.route("/whoami")
+    def whoami():
+        return g.cognito_user
+
+    return dash_app
+
+
+def test_that_a_restarted_app_skips_cognito_for_known_tokens(
+    tmp_path, access_token, user_info
+):
+    """
+    Bearer tokens validated before the restart are accepted without Cognito.
+    """
+
+    # Arrange
+    path = str(tmp_path / "caches.snapshot")
+    before = CognitoOAuth(
+        make_app(),
+        domain="test",
+        region="eu-central-1",
+        allow_bearer_tokens=True,
+        cache_snapshot_path=path,
+    )
+    before.app.server.config["COGNITO_OAUTH_CLIENT_ID"] = "testclient"
+    headers = {"Authorization": f"Bearer {access_token()}"}
+    before.http_session.get = MagicMock(
+        return_value=user_info(email="user@example.com")
+    )
+    before.app.server.test_client().get("/whoami", headers=headers)
+    before.save_cache_snapshot()
+
+    # Act
+    after = CognitoOAuth(
+        make_app(),
+        domain="test",
+        region="eu-central-1",
+        allow_bearer_tokens=True,
+        cache_snapshot_path=path,
+    )
+    after.http_session.get = MagicMock()
+    response = after.app.server.test_client().get("/whoami", headers=headers)
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert response.json == {"email": "user@example.com"}
+    after.http_session.get.assert_not_called()
+
+
+def test_that_snapshots_of_other_user_attributes_are_ignored(tmp_path):
+    """
+    Cached users saved for another attribute mapping aren't restored, they would
+    be attributed to the wrong attributes.
+    """
+
+    # Arrange
+    path = str(tmp_path / "caches.snapshot")
+    before = CognitoOAuth(
+        make_app(),
+        domain="test",
+        region="eu-central-1",
+        cache_snapshot_path=path,
+    )
+    before.bearer_token_cache.set(b"token", before.pack_user({"email": "a@x"}))
+    before.save_cache_snapshot()
+
+    # Act
+    after = CognitoOAuth(
+        make_app(),
+        domain="test",
+        region="eu-central-1",
+        user_info_to_session_attr_mapping={"sub": "user_id", "email": "email"},
+        cache_snapshot_path=path,
+    )
+
+    # Assert
+    assert len(after.bearer_token_cache) == 0
+
+
+def test_that_processes_sharing_a_snapshot_merge_their_entries(tmp_path):
+    """
+    A save keeps the unexpired entries other processes saved to the file.
+    """
+
+    # Arrange
+    path = str(tmp_path / "caches.snapshot")
+    worker, other_worker = TTLCache(ttl=60), TTLCache(ttl=60)
+    worker.set("shared", "old")
+    worker.set("expired", "old", ttl=0.05)
+    worker.set("worker", "worker")
+    other_worker.set("shared", "new")
+    other_worker.set("other", "other")
+    CacheSnapshot(path).save({"users": worker}, "secret")
+    time.sleep(0.1)
+
+    # Act
+    CacheSnapshot(path).save({"users": other_worker}, "secret")
+    restored = TTLCache(ttl=60)
+    count = CacheSnapshot(path).load({"users": restored}, "secret")
+
+    # Assert
+    assert count == 3
+    assert restored.get("shared") == "new"
+    assert restored.get("worker") == "worker"
+    assert restored.get("other") == "other"
+    assert restored.get("expired") is None
+
+
+def test_that_periodic_saves_start_with_the_first_request_of_a_process(
+    tmp_path, monkeypatch
+):
+    """
+    The timer isn't started when the app is constructed, where it wouldn't
+    survive a fork, but by the first request of each process.
+    """
+
+    # Arrange
+    save_periodically = MagicMock()
+    monkeypatch.setattr(CacheSnapshot, "save_periodically", save_periodically)
+    auth = CognitoOAuth(
+        make_app(),
+        domain="test",
+        region="eu-central-1",
+        cache_snapshot_path=str(tmp_path / "caches.snapshot"),
+        cache_snapshot_interval=30,
+    )
+    client = auth.app.server.test_client()
+    constructed_calls = save_periodically.call_count
+
+    # Act
+    client.get("/")
+    client.get("/")
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+    client.get("/")
+
+    # Assert
+    assert constructed_calls == 0
+    assert save_periodically.call_count == 2
+    assert save_periodically.call_args.args == (auth.save_cache_snapshot, 30)
+
+
+def test_that_a_missing_secret_key_is_a_warning(tmp_path, caplog):
+    """
+    Without a secret key the snapshot can't be verified, which is logged as a
+    warning instead of being hidden among the expected misses.
+    """
+
+    # Arrange
+    snapshot = CacheSnapshot(str(tmp_path / "caches.snapshot"))
+
+    # Act
+    count = snapshot.load({"users": TTLCache()}, None)
+
+    # Assert
+    assert count == 0
+    assert [record.levelname for record in caplog.records] == ["WARNING"]
@@ -0,0 +1,221 @@
+"""
+Test the multi-tenant mode that selects the Cognito user pool per request.
+"""
+
+# pylint: disable=W0212,W0621
+import threading
+from http import HTTPStatus
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from dash import Dash
+from flask import g
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cognito_oauth import TICKET_COOKIE_NAME
+from dash_cognito_auth.tenants import CognitoTenant, TenantRegistry, tenants_by_host
+
+TENANTS = {
+    "a.example.com": CognitoTenant(
+        "a", "pool-a", "eu-central-1", client_id="client-a", client_secret="secret-a"
+    ),
+    "b.example.com": CognitoTenant(
+        "b", "auth.b.example.com", client_id="client-b", client_secret="secret-b"
+    ),
+}
+
+
+@pytest.fixture
+def tenant_app(app: Dash) -> CognitoOAuth:
+    """
+    App serving the tenants a and b by host name, with a /whoami endpoint.
+    """
+
+    @app.server.route("/whoami")
+    def whoami():
+        return g.cognito_user
+
+    return CognitoOAuth(
+        app,
+        tenants=TenantRegistry(tenants_by_host(TENANTS)),
+        allow_bearer_tokens=True,
+        ticket_ttl=60,
+    )
+
+
+def test_that_the_login_uses_the_pool_of_the_host(tenant_app: CognitoOAuth):
+    """
+    Users are sent to the Cognito domain and app client of their tenant.
+    """
+
+    # Arrange
+    client = tenant_app.app.server.test_client()
+
+    # Act
+    response_a = client.get("/login/cognito", base_url="https://a.example.com")
+    response_b = client.get("/login/cognito", base_url="https://b.example.com:8443")
+
+    # Assert
+    location_a = urlparse(response_a.headers["Location"])
+    location_b = urlparse(response_b.headers["Location"])
+    assert location_a.netloc == "pool-a.auth.eu-central-1.amazoncognito.com"
+    assert parse_qs(location_a.query)["client_id"] == ["client-a"]
+    assert location_b.netloc == "auth.b.example.com"
+    assert parse_qs(location_b.query)["client_id"] == ["client-b"]
+
+
+def test_that_unknown_hosts_are_not_found(tenant_app: CognitoOAuth):
+    """
+    Requests that don't belong to a tenant are answered with a 404.
+    """
+
+    # Arrange
+    client = tenant_app.app.server.test_client()
+
+    # Act
+    response = client.get("/", base_url="https://unknown.example.com")
+
+    # Assert
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_that_tickets_are_only_valid_for_their_tenant(
+    tenant_app: CognitoOAuth, stub_cognito
+):
+    """
+    A ticket issued for one tenant doesn't authorize requests of another.
+    """
+
+    # Arrange
+    ticket = tenant_app.ticket_serializer().dumps(
+        {"sub": "1234", "user": {"email": "user@example.com"}, "tenant": "a"}
+    )
+    client = tenant_app.app.server.test_client()
+    stub_cognito.authorized = False
+
+    # Act
+    responses = {}
+    for host in ("a.example.com", "b.example.com"):
+        client.set_cookie(TICKET_COOKIE_NAME, ticket, domain=host)
+        responses[host] = client.get("/whoami", base_url=f"https://{host}")
+
+    # Assert
+    assert responses["a.example.com"].status_code == HTTPStatus.OK
+    assert responses["b.example.com"].status_code == HTTPStatus.FORBIDDEN
+
+
+def test_that_bearer_tokens_are_validated_by_the_pool_of_the_host(
+    tenant_app: CognitoOAuth, access_token, user_info
+):
+    """
+    Bearer tokens are checked against and cached for the pool of the tenant.
+    """
+
+    # Arrange
+    tenant_app.http_session.get = MagicMock(
+        return_value=user_info(email="user@example.com")
+    )
+    client = tenant_app.app.server.test_client()
+    tokens = {
+        "a.example.com": access_token(client_id="client-a"),
+        "b.example.com": access_token(client_id="client-b"),
+    }
+
+    # Act
+    for host in ("a.example.com", "a.example.com", "b.example.com"):
+        client.get(
+            "/whoami",
+            base_url=f"https://{host}",
+            headers={"Authorization": f"Bearer {tokens[host]}"},
+        )
+
+    # Assert
+    urls = [call.args[0] for call in tenant_app.http_session.get.call_args_list]
+    assert urls == [
+        "https://pool-a.auth.eu-central-1.amazoncognito.com/oauth2/userInfo",
+        "https://auth.b.example.com/oauth2/userInfo",
+    ]
+
+
+def test_that_the_least_recently_used_tenant_is_evicted():
+    """
+    The registry keeps at most max_tenants contexts.
+    """
+
+    # Arrange
+    registry = TenantRegistry(tenants_by_host(TENANTS), max_tenants=1)
+    request_a = SimpleNamespace(host="a.example.com")
+    request_b = SimpleNamespace(host="b.example.com")
+
+    # Act
+    first = registry.context(request_a)
+    registry.context(request_b)
+    second = registry.context(request_a)
+
+    # Assert
+    assert first is not second
+    assert registry.stats() == {"size": 1, "max_tenants": 1, "evictions": 2}
+
+
+def test_that_domain_or_tenants_are_required(app: Dash):
+    """
+    Without a domain there have to be tenants.
+    """
+
+    # Act + Assert
+    with pytest.raises(ValueError):
+        CognitoOAuth(app)
+
+
+def test_that_bearer_tokens_of_another_tenant_are_rejected(
+    tenant_app: CognitoOAuth, access_token
+):
+    """
+    A token issued to the app client of one tenant isn't accepted by another.
+    """
+
+    # Arrange
+    tenant_app.http_session.get = MagicMock()
+    client = tenant_app.app.server.test_client()
+    headers = {"Authorization": f"Bearer {access_token(client_id='client-a')}"}
+
+    # Act
+    response = client.get("/whoami", base_url="https://b.example.com", headers=headers)
+
+    # Assert
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    tenant_app.http_session.get.assert_not_called()
+
+
+def test_that_new_tenants_are_warmed_up_once_on_one_thread(app: Dash, monkeypatch):
+    """
+    Tenants are warmed up by a single background thread, without changing the
+    registry, and only once while their context is kept.
+    """
+
+    # Arrange
+    head = MagicMock()
+    monkeypatch.setattr(requests.Session, "head", head)
+    registry = TenantRegistry(tenants_by_host(TENANTS))
+    auth = CognitoOAuth(app, tenants=registry, warm_up=True)
+    client = auth.app.server.test_client()
+    threads = set(threading.enumerate())
+
+    # Act
+    for host in ("a.example.com", "b.example.com", "a.example.com"):
+        client.get("/login/cognito", base_url=f"https://{host}")
+    auth._tenant_warm_ups.join()
+
+    # Assert
+    assert [call.args[0] for call in head.call_args_list] == [
+        "https://pool-a.auth.eu-central-1.amazoncognito.com",
+        "https://auth.b.example.com",
+    ]
+    assert [thread.name for thread in set(threading.enumerate()) - threads] == [
+        "cognito-tenant-warm-up"
+    ]
+    assert not hasattr(registry, "created")
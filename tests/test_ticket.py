@@ -0,0 +1,149 @@
+"""
+Test the signed authorization ticket that skips the Cognito checks.
+"""
+
+# pylint: disable=W0621
+from http import HTTPStatus
+from unittest.mock import patch
+
+import pytest
+
+from dash import Dash
+from flask import g, redirect
+from flask_dance.consumer import oauth_authorized
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.cognito_oauth import TICKET_COOKIE_NAME
+
+
+@pytest.fixture
+def ticket_app(app: Dash) -> CognitoOAuth:
+    """
+    App that issues tickets and has a /whoami endpoint returning the user.
+    """
+
+    @app.server.route("/whoami")
+    def whoami():
+        return g.cognito_user
+
+    return CognitoOAuth(
+        app, domain="test", region="eu-central-1", ticket_ttl=60, logout_url="logout"
+    )
+
+
+def test_that_a_ticket_is_issued_after_authorization(
+    ticket_app: CognitoOAuth, stub_cognito
+):
+    """
+    The first request is checked against Cognito and gets a ticket cookie.
+    """
+
+    # Arrange
+    client = ticket_app.app.server.test_client()
+
+    # Act
+    response = client.get("/whoami")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert stub_cognito.get.call_count == 1
+    assert client.get_cookie(TICKET_COOKIE_NAME) is not None
+
+
+def test_that_a_valid_ticket_skips_cognito(ticket_app: CognitoOAuth, stub_cognito):
+    """
+    As long as the ticket is valid, Cognito isn't called again.
+    """
+
+    # Arrange
+    client = ticket_app.app.server.test_client()
+    client.get("/whoami")
+
+    # Act
+    stub_cognito.authorized = False
+    responses = [client.get("/whoami") for _ in range(3)]
+
+    # Assert
+    assert all(response.status_code == HTTPStatus.OK for response in responses)
+    assert responses[-1].json == {"email": "user@example.com"}
+    assert stub_cognito.get.call_count == 1
+
+
+def test_that_an_expired_ticket_falls_back_to_cognito(
+    ticket_app: CognitoOAuth, stub_cognito
+):
+    """
+    Once the ticket lapses, the request is checked against Cognito again.
+    """
+
+    # Arrange
+    client = ticket_app.app.server.test_client()
+    with patch("itsdangerous.timed.time.time", return_value=1_000_000):
+        client.get("/whoami")
+
+    # Act
+    response = client.get("/whoami")
+
+    # Assert
+    assert response.status_code == HTTPStatus.OK
+    assert stub_cognito.get.call_count == 2
+
+
+def test_that_a_forged_ticket_is_rejected(ticket_app: CognitoOAuth, stub_cognito):
+    """
+    Tickets that aren't signed with the app secret aren't accepted.
+    """
+
+    # Arrange
+    stub_cognito.authorized = False
+    client = ticket_app.app.server.test_client()
+    client.set_cookie(TICKET_COOKIE_NAME, '{"sub": "1234", "user": {}}.abc.def')
+
+    # Act
+    response = client.get("/whoami")
+
+    # Assert
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+def test_that_logout_removes_the_ticket(ticket_app: CognitoOAuth, stub_cognito):
+    """
+    Logging out deletes the ticket cookie.
+    """
+
+    # Arrange
+    client = ticket_app.app.server.test_client()
+    client.get("/whoami")
+
+    # Act
+    client.get("/logout")
+
+    # Assert
+    assert client.get_cookie(TICKET_COOKIE_NAME) is None
+
+
+def test_that_a_new_login_removes_the_ticket(app: Dash, stub_cognito):
+    """
+    A ticket issued before another login on the same browser isn't used for the
+    new session.
+    """
+
+    # Arrange
+    def authorized_call(blueprint):
+        oauth_authorized.send(blueprint, token={"access_token": "other"})
+        return redirect("/")
+
+    with patch(
+        "flask_dance.consumer.oauth2.OAuth2ConsumerBlueprint.authorized",
+        authorized_call,
+    ):
+        auth = CognitoOAuth(app, domain="test", region="eu-central-1", ticket_ttl=60)
+    client = auth.app.server.test_client()
+    client.get("/_dash-layout")
+
+    # Act
+    client.get("/login/cognito/authorized?code=abc&state=def")
+
+    # Assert
+    assert stub_cognito.get.call_count == 1
+    assert client.get_cookie(TICKET_COOKIE_NAME) is None
@@ -0,0 +1,130 @@
+"""
+Test the bounded concurrency for calls to Cognito.
+"""
+
+import threading
+from http import HTTPStatus
+
+import pytest
+import requests
+
+from dash_cognito_auth import CognitoOAuth
+from dash_cognito_auth.upstream import UpstreamLimiter, UpstreamOverloaded
+
+
+def test_that_the_limiter_rejects_when_the_queue_is_full():
+    """
+    With all slots taken and no room in the queue, callers are rejected at once.
+    """
+
+    # Arrange
+    limiter = UpstreamLimiter(1, max_waiting=0)
+
+    # Act + Assert
+    with limiter.slot():
+        with pytest.raises(UpstreamOverloaded):
+            with limiter.slot():
+                pass
+
+    assert limiter.rejected == 1
+    assert limiter.in_flight == 0
+
+
+def test_that_the_limiter_rejects_after_the_timeout():
+    """
+    Callers that wait longer than the timeout for a slot are rejected.
+    """
+
+    # Arrange
+    limiter = UpstreamLimiter(1, max_waiting=1, timeout=0.01)
+
+    # Act + Assert
+    with limiter.slot():
+        with pytest.raises(UpstreamOverloaded):
+            with limiter.slot():
+                pass
+
+    assert limiter.waiting == 0
+
+
+def test_that_waiting_callers_get_a_free_slot():
+    """
+    Callers in the queue proceed once a slot is released.
+    """
+
+    # Arrange
+    limiter = UpstreamLimiter(1, max_waiting=1, timeout=5)
+    acquired = threading.Event()
+
+    def wait_for_slot():
+        with limiter.slot():
+            acquired.set()
+
+    # Act
+    with limiter.slot():
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        assert not acquired.wait(0.05)
+
+    waiter.join(5)
+
+    # Assert
+    assert acquired.is_set()
+
+
+def test_that_an_overloaded_upstream_results_in_a_503(app, stub_cognito):
+    """
+    Requests that can't get a slot for the user info call are answered with a 503
+    and a Retry-After header.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        max_upstream_calls=1,
+        upstream_queue_size=0,
+    )
+    client = auth.app.server.test_client()
+
+    # Act
+    with auth.upstream_limiter.slot():
+        response = client.get("/")
+
+    # Assert
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "5"
+    stub_cognito.get.assert_not_called()
+
+
+def test_that_a_stuck_cognito_call_releases_its_slot(app, stub_cognito):
+    """
+    Calls to Cognito time out, the request gets a 503 and the slot is free for
+    the next request.
+    """
+
+    # Arrange
+    auth = CognitoOAuth(
+        app,
+        domain="test",
+        region="eu-central-1",
+        max_upstream_calls=1,
+        upstream_queue_size=0,
+        upstream_call_timeout=2,
+    )
+    client = auth.app.server.test_client()
+    stub_cognito.get.side_effect = requests.Timeout("read timed out")
+
+    # Act
+    first = client.get("/")
+    second = client.get("/")
+
+    # Assert
+    assert first.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert first.headers["Retry-After"] == "5"
+    assert second.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert stub_cognito.get.call_count == 2
+    assert stub_cognito.get.call_args.kwargs["timeout"] == 2
+    assert auth.upstream_limiter.in_flight == 0
+    assert app.server.blueprints["cognito"].token_url_params["timeout"] == 2